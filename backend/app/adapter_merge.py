@@ -0,0 +1,171 @@
+# backend/app/adapter_merge.py
+"""
+LoRA adapters merged into their base weights, for serving hot adapters.
+
+A PEFT-wrapped model pays extra matmuls in every targeted module on every
+token. For adapters that get a lot of traffic, the engine serves a merged copy
+instead (W + BA folded in, plain transformers model, no adapter overhead).
+Merged weights are written once as safetensors next to the adapter:
+
+    /data/models/job_<id>/merged/    config.json, model.safetensors, merged.json
+
+merged.json records the adapter hash and base revision it was built from; a
+copy whose adapter or base has changed since is rebuilt, never served.
+HotAdapterPolicy decides which adapters are worth a merged copy, and
+enforce_quota keeps the copies on disk within INFER_MERGED_DISK_QUOTA_GB
+(least recently loaded first; an evicted copy is simply rebuilt when needed).
+
+Copies are saved in full precision. On GPU the engine loads them like any
+base, i.e. quantized to 4-bit NF4: W + BA is quantized as a whole, while the
+adapter path runs the LoRA matmuls unquantized beside an NF4 W, so merged
+outputs on GPU differ slightly from unmerged ones.
+"""
+import collections
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from .artifacts import manifest as adapter_manifest
+from .config import settings
+from .job_spec import base_revision
+from .model_loader import load_causal_lm
+
+MERGED_MANIFEST = "merged.json"
+LAST_USED = ".last_used"   # mtime is bumped on every load
+GB = 1024 ** 3
+
+
+def merged_dir_for_adapter(adapter_dir: str) -> str:
+    return os.path.join(os.path.dirname(adapter_dir.rstrip("/")), "merged")
+
+
+def _expected(base_model: str, adapter_dir: str) -> dict:
+    return {
+        "base_model": base_model,
+        "base_revision": base_revision(base_model),
+        "adapter_hash": adapter_manifest(adapter_dir)["adapter_hash"],
+    }
+
+
+def merged_ready(base_model: str, adapter_dir: str):
+    """Path of an up-to-date merged copy of this adapter, else None."""
+    out = merged_dir_for_adapter(adapter_dir)
+    try:
+        with open(os.path.join(out, MERGED_MANIFEST)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    expected = _expected(base_model, adapter_dir)
+    if not all(meta.get(k) == v for k, v in expected.items()):
+        return None
+    try:
+        os.utime(os.path.join(out, LAST_USED))
+    except FileNotFoundError:
+        open(os.path.join(out, LAST_USED), "w").close()
+    except OSError:
+        pass   # read-only volume: LRU order just stays as it was
+    return out
+
+
+def merge_adapter(base_model: str, adapter_dir: str, out_dir: str = None) -> str:
+    """Fold the adapter into a fresh full-precision copy of the base and save it as safetensors."""
+    from peft import PeftModel
+
+    out_dir = out_dir or merged_dir_for_adapter(adapter_dir)
+    start = time.perf_counter()
+    # never the resident base: merging rewrites its weights in place
+    model, _ = load_causal_lm(base_model)
+    model = PeftModel.from_pretrained(model, adapter_dir).merge_and_unload(safe_merge=True)
+
+    tmp = f"{out_dir}.tmp-{uuid.uuid4().hex[:8]}"
+    try:
+        model.save_pretrained(tmp)
+        with open(os.path.join(tmp, MERGED_MANIFEST), "w") as f:
+            json.dump({
+                **_expected(base_model, adapter_dir),
+                "merged_at": time.time(),
+                "seconds": round(time.perf_counter() - start, 2),
+            }, f)
+        open(os.path.join(tmp, LAST_USED), "w").close()
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp, out_dir)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(f"[MERGE] {adapter_dir} -> {out_dir} in {time.perf_counter() - start:.1f}s")
+    return out_dir
+
+
+# -------- Disk quota -------
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def merged_copies(root: str) -> list:
+    """Merged copies under root/job_*/merged, with their size and last load time."""
+    out = []
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        path = os.path.join(root, name, "merged")
+        if not os.path.exists(os.path.join(path, MERGED_MANIFEST)):
+            continue
+        try:
+            last_used = os.path.getmtime(os.path.join(path, LAST_USED))
+        except OSError:
+            last_used = 0.0
+        out.append({"path": path, "bytes": _dir_bytes(path), "last_used": last_used})
+    return out
+
+
+def enforce_quota(root: str, protect=()) -> list:
+    """Delete least recently loaded merged copies until they fit INFER_MERGED_DISK_QUOTA_GB (0 = no limit)."""
+    quota = settings.INFER_MERGED_DISK_QUOTA_GB * GB
+    if not quota:
+        return []
+    copies = sorted(merged_copies(root), key=lambda c: c["last_used"])
+    used = sum(c["bytes"] for c in copies)
+    evicted = []
+    for c in copies:
+        if used <= quota:
+            break
+        if c["path"] in protect:
+            continue
+        shutil.rmtree(c["path"], ignore_errors=True)
+        used -= c["bytes"]
+        evicted.append(c["path"])
+        print(f"[MERGE] Evicted {c['path']}")
+    return evicted
+
+
+class HotAdapterPolicy:
+    """Promotes an adapter to merged serving once it has `min_requests` requests in `window_s` seconds."""
+
+    def __init__(self, min_requests: int, window_s: float):
+        self.min_requests = max(1, min_requests)
+        self.window_s = window_s
+        self._seen = collections.defaultdict(collections.deque)   # key -> request times
+        self._lock = threading.Lock()
+
+    def record(self, key, n: int = 1) -> bool:
+        """Count n requests for key; True when it is hot."""
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen[key]
+            seen.extend([now] * n)
+            self._expire(seen, now)
+            return len(seen) >= self.min_requests
+
+    def _expire(self, seen, now):
+        while seen and seen[0] < now - self.window_s:
+            seen.popleft()
+
+    def counts(self) -> dict:
+        """Requests per adapter within the window."""
+        now = time.monotonic()
+        with self._lock:
+            for key in list(self._seen):
+                self._expire(self._seen[key], now)
+                if not self._seen[key]:
+                    del self._seen[key]
+            return {str(key): len(seen) for key, seen in self._seen.items()}
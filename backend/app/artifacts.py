@@ -0,0 +1,191 @@
+# backend/app/artifacts.py
+"""
+Adapter artifacts: content hashes and a deterministic, range-addressable zip.
+
+The adapter directory written by training is the only copy that has to exist.
+A manifest (size, sha256 and crc32 per file) is cached next to it in
+artifact.json; from it the zip is laid out up front as a list of segments
+(literal header bytes or whole files), so its total size is known, any byte
+range can be served without building the archive, and the same adapter always
+yields byte-identical zips (fixed timestamps, sorted names, no compression).
+The adapter hash is the sha256 of the manifest's (name, sha256) list.
+"""
+import hashlib
+import json
+import os
+import struct
+import uuid
+import zlib
+
+READ_BYTES = 1024 * 1024
+MANIFEST_NAME = "artifact.json"
+ZIP_LAYOUT_VERSION = 1   # bump if the generated zip bytes change
+
+# zip records for STORED members; DOS date 1980-01-01 00:00 keeps the bytes stable
+_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END = struct.Struct("<IHHHHIIH")
+_DOS_TIME, _DOS_DATE = 0, (1 << 5) | 1
+_UTF8_NAMES = 0x800
+_FILE_ATTRS = 0o100644 << 16
+
+ADAPTER_ROOT = "/data/models"
+
+
+def adapter_dir_for_job(job_id: int) -> str:
+    return os.path.join(ADAPTER_ROOT, f"job_{job_id}", "adapter")
+ZIP_MAX_BYTES = 0xFFFFFFFF   # no zip64; adapters are far smaller
+
+
+class ArtifactMissing(FileNotFoundError):
+    pass
+
+
+def _files(adapter_dir: str):
+    out = []
+    for root, _, names in os.walk(adapter_dir):
+        for name in names:
+            full = os.path.join(root, name)
+            out.append((os.path.relpath(full, adapter_dir).replace(os.sep, "/"), full))
+    return sorted(out)
+
+
+def _stamp(files) -> list:
+    """Cheap identity of the directory contents, to validate the cached manifest."""
+    return [[rel, os.stat(full).st_size, os.stat(full).st_mtime_ns] for rel, full in files]
+
+
+def _digest_file(path: str):
+    sha, crc = hashlib.sha256(), 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BYTES), b""):
+            sha.update(block)
+            crc = zlib.crc32(block, crc)
+    return sha.hexdigest(), crc
+
+
+def manifest(adapter_dir: str) -> dict:
+    """{"adapter_hash", "files": [{name, size, sha256, crc32}]}, cached in artifact.json."""
+    if not os.path.isdir(adapter_dir):
+        raise ArtifactMissing(adapter_dir)
+    files = _files(adapter_dir)
+    if not files:
+        raise ArtifactMissing(adapter_dir)
+    stamp = _stamp(files)
+    cache_path = os.path.join(os.path.dirname(adapter_dir.rstrip("/")), MANIFEST_NAME)
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get("stamp") == stamp:
+            return cached
+    except (OSError, ValueError):
+        pass
+
+    entries = []
+    for (rel, full), (_, size, _) in zip(files, stamp):
+        sha, crc = _digest_file(full)
+        entries.append({"name": rel, "size": size, "sha256": sha, "crc32": crc})
+    adapter_hash = hashlib.sha256(
+        "\n".join(f"{e['name']}:{e['sha256']}" for e in entries).encode()
+    ).hexdigest()
+    out = {"adapter_hash": adapter_hash, "files": entries, "stamp": stamp}
+
+    tmp = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(out, f)
+        os.replace(tmp, cache_path)
+    except OSError:   # read-only volume; the manifest is just recomputed next time
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+
+# -------- Deterministic zip -------
+def zip_segments(adapter_dir: str, meta: dict = None) -> list:
+    """The zip as [(bytes, None) | (None, (path, size))], in output order."""
+    meta = meta or manifest(adapter_dir)
+    segments, central, offset = [], [], 0
+    for e in meta["files"]:
+        name = e["name"].encode("utf-8")
+        header = _LOCAL.pack(
+            0x04034B50, 20, _UTF8_NAMES, 0, _DOS_TIME, _DOS_DATE,
+            e["crc32"], e["size"], e["size"], len(name), 0,
+        ) + name
+        central.append(_CENTRAL.pack(
+            0x02014B50, 20, 20, _UTF8_NAMES, 0, _DOS_TIME, _DOS_DATE,
+            e["crc32"], e["size"], e["size"], len(name), 0, 0, 0, 0, _FILE_ATTRS, offset,
+        ) + name)
+        segments.append((header, None))
+        segments.append((None, (os.path.join(adapter_dir, e["name"]), e["size"])))
+        offset += len(header) + e["size"]
+    directory = b"".join(central)
+    n = len(meta["files"])
+    end = _END.pack(0x06054B50, 0, 0, n, n, len(directory), offset, 0)
+    if offset + len(directory) + len(end) > ZIP_MAX_BYTES:
+        raise ValueError("Adapter too large for a zip without zip64; download the files individually")
+    segments.append((directory + end, None))
+    return segments
+
+
+def segments_size(segments) -> int:
+    return sum(len(data) if data is not None else ref[1] for data, ref in segments)
+
+
+def iter_segments(segments, start: int = 0, end: int = None):
+    """Yield bytes [start, end] (inclusive) of the concatenated segments."""
+    end = segments_size(segments) - 1 if end is None else end
+    pos = 0
+    for data, ref in segments:
+        size = len(data) if data is not None else ref[1]
+        lo, hi = max(start, pos), min(end + 1, pos + size)
+        if lo < hi:
+            if data is not None:
+                yield data[lo - pos:hi - pos]
+            else:
+                with open(ref[0], "rb") as f:
+                    f.seek(lo - pos)
+                    remaining = hi - lo
+                    while remaining > 0:
+                        block = f.read(min(READ_BYTES, remaining))
+                        if not block:
+                            raise IOError(f"{ref[0]} shrank while being served")
+                        remaining -= len(block)
+                        yield block
+        pos += size
+        if pos > end:
+            break
+
+
+def write_zip(adapter_dir: str, zip_path: str, meta: dict = None) -> str:
+    """Materialize the same bytes the download endpoint streams (atomic)."""
+    tmp = f"{zip_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "wb") as out:
+        for block in iter_segments(zip_segments(adapter_dir, meta)):
+            out.write(block)
+    os.replace(tmp, zip_path)
+    return zip_path
+
+
+# -------- HTTP ranges -------
+def parse_range(header: str, size: int):
+    """(start, end) for a single `bytes=` range, None to send the whole body.
+
+    Raises ValueError when the range cannot be satisfied (-> 416). Multi-range
+    requests get the whole body, which RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":   # suffix: the last N bytes; "-0" selects nothing
+            n = int(last)
+            start, end = (max(0, size - n) if n > 0 else size), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None   # malformed ranges are ignored
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
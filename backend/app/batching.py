@@ -0,0 +1,127 @@
+# backend/app/batching.py
+import threading
+import time
+from concurrent.futures import Future
+
+from .config import settings
+from .inference_engine import engine
+from .executor import inference_executor
+
+
+class _Pending:
+    __slots__ = ("prompt", "future", "enqueued")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class MicroBatcher:
+    """Coalesces concurrent generate calls into one batched model.generate.
+
+    Requests are grouped by (base_model, adapter, generation kwargs). A group is
+    flushed when it reaches max_batch_size or its oldest request has waited
+    max_wait_ms, whichever comes first. Each group gets a dispatcher thread that
+    retires once its queue drains; the batches themselves run on the executor.
+    """
+
+    def __init__(self, engine, executor, max_batch_size: int, max_wait_ms: int):
+        self.engine = engine
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._cond = threading.Condition()
+        self._pending = {}      # key -> [_Pending]
+        self._workers = {}      # key -> Thread
+
+        self.batches = 0
+        self.batched_requests = 0
+        self.max_seen_batch = 0
+
+    def submit(self, base_model: str, job_id, prompt: str, **gen_kwargs) -> Future:
+        key = (base_model, job_id, tuple(sorted(gen_kwargs.items())))
+        self.executor.admit()   # raises InferenceSaturated (429) when the queue is full
+        item = _Pending(prompt)
+        item.future.add_done_callback(self.executor.release)
+        with self._cond:
+            self._pending.setdefault(key, []).append(item)
+            if key not in self._workers:
+                worker = threading.Thread(target=self._run, args=(key,), daemon=True)
+                self._workers[key] = worker
+                worker.start()
+            self._cond.notify_all()
+        return item.future
+
+    def _next_batch(self, key):
+        with self._cond:
+            queue = self._pending.get(key)
+            if not queue:
+                self._pending.pop(key, None)
+                self._workers.pop(key, None)
+                return None
+
+            deadline = queue[0].enqueued + self.max_wait
+            while len(queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = queue[:self.max_batch_size]
+            del queue[:len(batch)]
+            return batch
+
+    def _run(self, key):
+        base_model, job_id, kwargs = key
+        while True:
+            batch = self._next_batch(key)
+            if batch is None:
+                return
+
+            # Callers that already gave up are dropped before touching the model
+            batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                outputs = self.executor.execute(
+                    self.engine.generate_batch,
+                    base_model, job_id, [p.prompt for p in batch],
+                    enqueued_at=[p.enqueued for p in batch],
+                    **dict(kwargs)
+                ).result()
+            except Exception as e:
+                for p in batch:
+                    p.future.set_exception(e)
+                continue
+
+            with self._cond:
+                self.batches += 1
+                self.batched_requests += len(batch)
+                self.max_seen_batch = max(self.max_seen_batch, len(batch))
+            for p, out in zip(batch, outputs):
+                p.future.set_result(out)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": int(self.max_wait * 1000),
+                "batches": self.batches,
+                "requests": self.batched_requests,
+                "avg_batch_size": (
+                    round(self.batched_requests / self.batches, 2) if self.batches else 0.0
+                ),
+                "max_seen_batch": self.max_seen_batch,
+                "pending": sum(len(q) for q in self._pending.values()),
+            }
+
+
+batcher = MicroBatcher(
+    engine,
+    inference_executor,
+    max_batch_size=settings.PREDICT_MAX_BATCH_SIZE,
+    max_wait_ms=settings.PREDICT_MAX_WAIT_MS,
+)
@@ -0,0 +1,2 @@
+# backend/app/bench/__init__.py
+"""Small benchmark scripts; run each with `python -m app.bench.<name>` from backend/."""
@@ -0,0 +1,109 @@
+# backend/app/bench/db_load.py
+"""
+Load test for the database-backed read endpoints.
+
+Fires --requests requests at --concurrency at a time against GET /jobs,
+/jobs/{id} and /models/trained, then prints throughput, latency percentiles
+and the connection pool counters from GET /db/stats.
+
+    python -m app.bench.db_load                       # in-process app (DATABASE_URL from env)
+    python -m app.bench.db_load --url http://localhost:8000 --concurrency 200
+
+In-process runs seed --seed-jobs rows first when the jobs table is empty, so
+a fresh SQLite file works as a stand-in for Postgres.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+
+def _percentile(values, q: float):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2) if values else None
+
+
+def _seed(n: int):
+    from app.db import Base, SessionLocal, engine, ensure_schema
+    from app import models
+
+    # ASGITransport does not run the app's lifespan, so set up the schema here
+    Base.metadata.create_all(bind=engine)
+    ensure_schema()
+    with SessionLocal() as db:
+        if db.query(models.Job.id).first():
+            return
+        db.add_all(
+            models.Job(
+                dataset_id=i % 10 + 1, base_model="gpt2", epochs=1,
+                status=random.choice(("completed", "queued", "failed")),
+            )
+            for i in range(n)
+        )
+        db.commit()
+    print(f"Seeded {n} jobs")
+
+
+async def _run(client: httpx.AsyncClient, n_requests: int, concurrency: int):
+    paths = ["/jobs?limit=50", "/models/trained?limit=50"] + [f"/jobs/{i}" for i in range(1, 51)]
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(random.choice(paths))
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                r = await client.get(path)
+                if r.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "req_per_s": round(n_requests / elapsed, 1),
+        "p50_ms": _percentile(latencies, 0.5),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+    }
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60)
+    else:
+        from app.main import app
+
+        _seed(args.seed_jobs)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", limits=limits, timeout=60
+        )
+    async with client:
+        await client.get("/jobs?limit=1")   # warm up the pool
+        result = await _run(client, args.requests, args.concurrency)
+        result["pool"] = (await client.get("/db/stats")).json()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="running API; default is the app in-process")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--seed-jobs", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+# backend/app/bench/int8_inference.py
+"""
+CPU inference in fp32 vs. dynamic int8: weight memory, tokens/sec and quality.
+
+Variants: the current serving path (fp32 base + attached adapter), the merged
+fp32 model, and int8 versions of both. Quality is perplexity on an evaluation
+text plus how many greedy tokens agree with fp32; int8 should stay within a
+few percent of fp32 perplexity.
+
+    python -m app.bench.int8_inference --model gpt2
+    python -m app.bench.int8_inference --model distilgpt2 --adapter-dir /data/models/job_12/adapter --eval-file notes.txt
+"""
+import argparse
+import json
+import math
+import tempfile
+
+import torch
+from peft import PeftModel
+
+from app.adapter_merge import merge_adapter
+from app.bench.merged_serving import random_adapter, time_generate
+from app.model_loader import load_causal_lm, load_tokenizer
+from app.quantize import model_bytes, quantize_int8
+
+EVAL_TEXT = (
+    "Fine-tuning adapts a pretrained language model to a narrow domain by training a small number "
+    "of extra parameters on task data. Low-rank adapters add a pair of thin matrices next to the "
+    "attention projections, so the base weights can be shared between many tasks. At serving time "
+    "the adapter can stay separate, which makes switching cheap, or be folded into the base weights, "
+    "which removes its overhead but needs a full copy of the model per adapter."
+)
+
+
+def perplexity(model, tokenizer, text: str, block_size: int = 256) -> float:
+    ids = tokenizer(text, return_tensors="pt").input_ids
+    losses, tokens = 0.0, 0
+    with torch.no_grad():
+        for start in range(0, ids.shape[1] - 1, block_size):
+            block = ids[:, start:start + block_size + 1]
+            loss = model(input_ids=block, labels=block).loss
+            losses += loss.item() * (block.shape[1] - 1)
+            tokens += block.shape[1] - 1
+    return round(math.exp(losses / tokens), 3)
+
+
+def main(args):
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    tokenizer = load_tokenizer(args.model, padding_side="left")
+    text = open(args.eval_file).read() if args.eval_file else EVAL_TEXT
+
+    with tempfile.TemporaryDirectory() as tmp:
+        adapter_dir = args.adapter_dir or random_adapter(args.model, f"{tmp}/adapter")
+        merged_dir = merge_adapter(args.model, adapter_dir, out_dir=f"{tmp}/merged")
+
+        def attached():
+            return PeftModel.from_pretrained(load_causal_lm(args.model)[0], adapter_dir).eval()
+
+        variants = {
+            "fp32-adapter": attached,
+            "fp32-merged": lambda: load_causal_lm(merged_dir)[0].eval(),
+            "int8-adapter": lambda: quantize_int8(attached()),
+            "int8-merged": lambda: quantize_int8(load_causal_lm(merged_dir)[0]),
+        }
+        results, reference = {}, {}
+        for name, build in variants.items():
+            model = build()
+            row = {"weights_mb": round(model_bytes(model) / 2 ** 20, 1), "perplexity": perplexity(model, tokenizer, text)}
+            for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+                tps, output = time_generate(model, tokenizer, batch_size, args.new_tokens, args.repeats)
+                row[f"batch_{batch_size}_tokens_per_sec"] = tps
+                reference.setdefault(batch_size, output)
+                row[f"batch_{batch_size}_greedy_agreement"] = round(
+                    (output == reference[batch_size]).float().mean().item(), 3
+                )
+            results[name] = row
+            print(f"{name}: {row}", flush=True)
+            del model
+
+    base = results["fp32-adapter"]
+    for row in results.values():
+        row["memory_ratio"] = round(base["weights_mb"] / row["weights_mb"], 2)
+        row["speedup_batch_1"] = round(row["batch_1_tokens_per_sec"] / base["batch_1_tokens_per_sec"], 2)
+    print(json.dumps({
+        "model": args.model, "adapter": args.adapter_dir or "random", "new_tokens": args.new_tokens,
+        "threads": torch.get_num_threads(), "quantized_engine": torch.backends.quantized.engine,
+        "baseline": "fp32-adapter", "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--adapter-dir", help="trained adapter; default is a random one")
+    parser.add_argument("--eval-file", help="text for perplexity; default is a short built-in paragraph")
+    parser.add_argument("--batch-sizes", default="1,8")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0)
+    main(parser.parse_args())
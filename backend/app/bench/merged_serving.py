@@ -0,0 +1,91 @@
+# backend/app/bench/merged_serving.py
+"""
+Generation throughput with a LoRA adapter attached (PEFT) vs. merged into the base.
+
+Uses a trained adapter (--adapter-dir) or a randomly initialized one of the
+shape training produces, merges it with adapter_merge.merge_adapter, and times
+greedy generation of both at a few batch sizes. Greedy outputs of the two are
+compared token for token.
+
+    python -m app.bench.merged_serving --model distilgpt2
+    python -m app.bench.merged_serving --model gpt2 --adapter-dir /data/models/job_12/adapter
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import torch
+from peft import LoraConfig, PeftModel, get_peft_model
+
+from app.adapter_merge import merge_adapter
+from app.job_spec import LORA, TRAIN_SEED, get_lora_target_modules
+from app.model_loader import load_causal_lm, load_tokenizer
+
+PROMPT = "The quick brown fox jumps over the lazy dog while"
+
+
+def random_adapter(model_name: str, out_dir: str) -> str:
+    torch.manual_seed(TRAIN_SEED)
+    model, _ = load_causal_lm(model_name)
+    config = LoraConfig(**LORA, target_modules=get_lora_target_modules(model_name), init_lora_weights=False)
+    get_peft_model(model, config).save_pretrained(out_dir)
+    return out_dir
+
+
+def time_generate(model, tokenizer, batch_size: int, new_tokens: int, repeats: int):
+    inputs = tokenizer([PROMPT] * batch_size, return_tensors="pt", padding=True)
+    kwargs = dict(
+        max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    with torch.no_grad():
+        model.generate(**inputs, **kwargs)   # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            output = model.generate(**inputs, **kwargs)
+        elapsed = time.perf_counter() - start
+    return round(batch_size * new_tokens * repeats / elapsed, 1), output
+
+
+def main(args):
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    tokenizer = load_tokenizer(args.model, padding_side="left")
+    with tempfile.TemporaryDirectory() as tmp:
+        adapter_dir = args.adapter_dir or random_adapter(args.model, f"{tmp}/adapter")
+        start = time.perf_counter()
+        merged_dir = merge_adapter(args.model, adapter_dir, out_dir=f"{tmp}/merged")
+        merge_s = time.perf_counter() - start
+
+        base, _ = load_causal_lm(args.model)
+        variants = {
+            "adapter": PeftModel.from_pretrained(base, adapter_dir).eval(),
+            "merged": load_causal_lm(merged_dir)[0].eval(),
+        }
+        results = {}
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            row, outputs = {}, {}
+            for name, model in variants.items():
+                row[f"{name}_tokens_per_sec"], outputs[name] = time_generate(
+                    model, tokenizer, batch_size, args.new_tokens, args.repeats
+                )
+            row["speedup"] = round(row["merged_tokens_per_sec"] / row["adapter_tokens_per_sec"], 2)
+            row["greedy_outputs_match"] = torch.equal(outputs["adapter"], outputs["merged"])
+            results[f"batch_{batch_size}"] = row
+            print(f"batch {batch_size}: {row}", flush=True)
+
+    print(json.dumps({
+        "model": args.model, "adapter": args.adapter_dir or "random", "new_tokens": args.new_tokens,
+        "threads": torch.get_num_threads(), "merge_seconds": round(merge_s, 2), "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--adapter-dir", help="trained adapter; default is a random one")
+    parser.add_argument("--batch-sizes", default="1,8")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0)
+    main(parser.parse_args())
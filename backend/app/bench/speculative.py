@@ -0,0 +1,93 @@
+# backend/app/bench/speculative.py
+"""
+Latency of plain vs. speculative (draft-assisted) decoding at batch size 1.
+
+The target is served the way the engine serves it (base + attached adapter;
+a random adapter unless --adapter-dir is given), the draft is the family's
+configured draft model. Reports tokens/sec for both, the speedup, the draft
+acceptance rate and whether greedy outputs are identical (they must be).
+
+    python -m app.bench.speculative --model gpt2-medium
+    python -m app.bench.speculative --model gpt2 --draft sshleifer/tiny-gpt2 --no-adapter
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import torch
+from peft import PeftModel
+
+from app.bench.merged_serving import random_adapter
+from app.inference_engine import LoadedBase
+from app.model_loader import load_causal_lm, load_tokenizer
+from app.speculative import SpeculationStats, draft_for, speculate
+
+PROMPTS = (
+    "The history of the printing press begins",
+    "To train a language model on a small dataset, you should",
+    "Once upon a time in a village by the sea,",
+    "The main difference between a list and a tuple in Python is",
+)
+
+
+def run(model, draft, tokenizer, new_tokens: int, stats=None):
+    tokens, elapsed, outputs = 0, 0.0, []
+    for prompt in PROMPTS:
+        inputs = tokenizer(prompt, return_tensors="pt")
+        with torch.no_grad(), speculate(model, draft, stats, "target") as spec:
+            start = time.perf_counter()
+            output = model.generate(
+                **inputs, max_new_tokens=new_tokens, do_sample=False,
+                pad_token_id=tokenizer.pad_token_id, **spec.generate_kwargs,
+            )
+            elapsed += time.perf_counter() - start
+            spec.new_tokens = output.shape[1] - inputs["input_ids"].shape[1]
+        tokens += spec.new_tokens
+        outputs.append(output)
+    return round(tokens / elapsed, 1), outputs
+
+
+def main(args):
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    draft_name = args.draft or draft_for(args.model)
+    if not draft_name:
+        raise SystemExit(f"No draft model configured for {args.model}; pass --draft")
+    tokenizer = load_tokenizer(args.model)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = load_causal_lm(args.model)[0].eval()
+        if not args.no_adapter:
+            adapter_dir = args.adapter_dir or random_adapter(args.model, f"{tmp}/adapter")
+            model = PeftModel.from_pretrained(model, adapter_dir).eval()
+        draft = LoadedBase(draft_name, None, load_causal_lm(draft_name)[0].eval())
+
+        run(model, draft, tokenizer, 8)   # warm-up
+        stats = SpeculationStats()
+        plain_tps, plain = run(model, None, tokenizer, args.new_tokens)
+        spec_tps, assisted = run(model, draft, tokenizer, args.new_tokens, stats)
+
+    result = {
+        "model": args.model,
+        "draft": draft_name,
+        "adapter": None if args.no_adapter else (args.adapter_dir or "random"),
+        "new_tokens": args.new_tokens,
+        "threads": torch.get_num_threads(),
+        "plain_tokens_per_sec": plain_tps,
+        "speculative_tokens_per_sec": spec_tps,
+        "speedup": round(spec_tps / plain_tps, 2),
+        "greedy_outputs_match": all(torch.equal(a, b) for a, b in zip(plain, assisted)),
+        "speculation": {k: v for k, v in stats.stats()["target"].items() if k != "draft"},
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default="gpt2-medium")
+    parser.add_argument("--draft", help="default: the family's draft (speculative.DRAFT_MODELS)")
+    parser.add_argument("--adapter-dir", help="trained adapter; default is a random one")
+    parser.add_argument("--no-adapter", action="store_true", help="serve the plain base")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,93 @@
+# backend/app/bench/startup.py
+"""
+Import time, startup time and memory of the API processes.
+
+Each target is measured in a fresh interpreter: time to import the app module,
+time for the lifespan startup plus a first request, RSS high-water mark, and
+which heavy ML modules ended up imported. --check fails when the control-plane
+API imports any of them, so a stray top-level `import torch` is caught.
+
+    python -m app.bench.startup
+    python -m app.bench.startup --check --record bench_startup.jsonl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("torch", "transformers", "peft", "bitsandbytes", "accelerate")
+
+# (name, module, env overrides, path of a cheap first request)
+TARGETS = (
+    ("control-plane", "app.main", {"SERVE_INFERENCE": "0"}, "/models"),
+    ("combined", "app.main", {"SERVE_INFERENCE": "1"}, "/models"),
+    ("inference", "app.inference_app", {}, "/adapters"),
+)
+CONTROL_PLANE = ("control-plane", "combined")
+
+_PROBE = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+mod = importlib.import_module({module!r})
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(mod.app) as client:
+    status = client.get({path!r}).status_code
+ready = time.perf_counter()
+print(json.dumps({{
+    "import_s": round(imported - start, 3),
+    "startup_and_first_request_s": round(ready - imported, 3),
+    "first_status": status,
+    "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(module: str, env: dict, path: str) -> dict:
+    code = _PROBE.format(module=module, path=path, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], env={**os.environ, **env}, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_s"] = round(time.perf_counter() - start, 3)   # includes interpreter start-up
+    return result
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args):
+    results = {name: measure(module, env, path) for name, module, env, path in TARGETS}
+    print(json.dumps(results, indent=2))
+
+    if args.record:
+        with open(args.record, "a") as f:
+            f.write(json.dumps({"time": time.time(), "rev": _git_rev(), "results": results}) + "\n")
+
+    if args.check:
+        failed = {
+            name: results[name].get("heavy_modules") or results[name].get("error")
+            for name in CONTROL_PLANE
+            if results[name].get("heavy_modules") or "error" in results[name]
+        }
+        if failed:
+            sys.exit(f"Control-plane API imported ML modules or failed to start: {failed}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--check", action="store_true", help="exit non-zero if the API imports ML modules")
+    parser.add_argument("--record", help="append the results as a JSON line to this file")
+    main(parser.parse_args())
@@ -0,0 +1,109 @@
+# backend/app/bench/train_profiles.py
+"""
+Training throughput per hardware profile on this machine.
+
+Runs a few LoRA optimizer steps over synthetic packed blocks for each profile
+and prints samples/sec. "legacy" is the recipe every job used before profiles
+existed (4-bit bitsandbytes base, fp16 autocast and the paged optimizer, also
+on CPU); "legacy-unquantized" is the same without the 4-bit load, for when
+bitsandbytes cannot run here at all.
+
+    python -m app.bench.train_profiles --model distilgpt2 --steps 20
+    python -m app.bench.train_profiles --profiles cpu-fp32,cpu-bf16 --compile
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import torch
+from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
+from transformers import Trainer, TrainingArguments, default_data_collator
+
+from app.job_spec import CPU_BF16, CPU_FP32, LORA, QLORA_VARIANT, TRAIN_SEED, get_lora_target_modules
+from app.lora_train import profile_load_kwargs, profile_training_args
+from app.model_loader import load_causal_lm, load_config
+
+
+class RandomBlocks(torch.utils.data.Dataset):
+    def __init__(self, n: int, block_size: int, vocab_size: int):
+        g = torch.Generator().manual_seed(TRAIN_SEED)
+        self.ids = torch.randint(0, vocab_size, (n, block_size), generator=g)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return {"input_ids": self.ids[i], "labels": self.ids[i]}
+
+
+def _variant(name: str, compile_: bool):
+    """(load kwargs, TrainingArguments kwargs, quantized) for a benchmark variant."""
+    if name == "legacy":
+        return profile_load_kwargs(QLORA_VARIANT), {"fp16": True, "optim": "paged_adamw_32bit"}, True
+    if name == "legacy-unquantized":
+        return {"torch_dtype": torch.float32}, {"use_cpu": True, "fp16": True, "optim": "adamw_torch"}, False
+    args = profile_training_args(name)
+    args["torch_compile"] = compile_
+    return profile_load_kwargs(name), args, False
+
+
+def run(name: str, model_name: str, steps: int, batch_size: int, block_size: int, compile_: bool) -> dict:
+    load_kwargs, train_kwargs, quantized = _variant(name, compile_)
+    config = load_config(model_name)
+    model, _ = load_causal_lm(model_name, config=config, **load_kwargs)
+    if quantized:
+        model = prepare_model_for_kbit_training(model)
+    model = get_peft_model(model, LoraConfig(**LORA, target_modules=get_lora_target_modules(model_name)))
+
+    data = RandomBlocks(steps * batch_size, block_size, config.vocab_size)
+    with tempfile.TemporaryDirectory() as out:
+        args = TrainingArguments(
+            output_dir=out,
+            per_device_train_batch_size=batch_size,
+            max_steps=steps,
+            learning_rate=2e-4,
+            save_strategy="no",
+            report_to=[],
+            logging_steps=steps,
+            seed=TRAIN_SEED,
+            **train_kwargs,
+        )
+        trainer = Trainer(model=model, args=args, train_dataset=data, data_collator=default_data_collator)
+        start = time.perf_counter()
+        result = trainer.train()
+        elapsed = time.perf_counter() - start
+    return {
+        "samples_per_sec": round(steps * batch_size / elapsed, 2),
+        "seconds": round(elapsed, 2),
+        "loss": round(result.training_loss, 4),
+    }
+
+
+def main(args):
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    results = {}
+    for name in args.profiles.split(","):
+        try:
+            results[name] = run(name, args.model, args.steps, args.batch_size, args.block_size, args.compile)
+        except Exception as e:   # e.g. bitsandbytes / fp16 unsupported on this CPU
+            results[name] = {"error": f"{type(e).__name__}: {e}"[:300]}
+        print(f"{name}: {results[name]}", flush=True)
+
+    print(json.dumps({
+        "model": args.model, "steps": args.steps, "batch_size": args.batch_size,
+        "block_size": args.block_size, "threads": torch.get_num_threads(),
+        "cuda": torch.cuda.is_available(), "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--profiles", default=f"legacy,legacy-unquantized,{CPU_FP32},{CPU_BF16}")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--block-size", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--compile", action="store_true", help="torch.compile the CPU profiles")
+    main(parser.parse_args())
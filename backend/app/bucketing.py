@@ -0,0 +1,109 @@
+# backend/app/bucketing.py
+"""
+Length-bucketed batching for sample-level training data.
+
+Samples are sorted by length and grouped so that every batch holds samples of
+similar length; each batch is padded only to its own longest sample, and the
+number of samples per batch is chosen so padded tokens stay under a token budget.
+"""
+import json
+import os
+import random
+
+import numpy as np
+
+
+class SampleDataset:
+    """Variable-length token samples from build_sample_cache, read via np.memmap."""
+
+    def __init__(self, cache_dir: str):
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["n_samples"] == 0:
+            raise ValueError("Dataset is empty after tokenization")
+        self.path = os.path.join(cache_dir, "tokens.bin")
+        self.dtype = np.dtype(meta["dtype"])
+        self.n_tokens = meta["n_tokens"]
+        self.offsets = np.load(os.path.join(cache_dir, "offsets.npy"))
+        self.lengths = np.diff(self.offsets)
+        self._tokens = None
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i):
+        import torch
+
+        if self._tokens is None:
+            self._tokens = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.n_tokens,))
+        ids = self._tokens[self.offsets[i]:self.offsets[i + 1]].astype(np.int64)
+        return {"input_ids": torch.from_numpy(ids)}
+
+
+def plan_batches(lengths, token_budget: int, max_batch_size: int, seed: int = 0):
+    """Group sample indices into batches of similar length under a padded-token budget."""
+    rng = random.Random(seed)
+    # random tie-break so equal-length samples don't always land in the same batches
+    order = sorted(range(len(lengths)), key=lambda i: (lengths[i], rng.random()))
+
+    batches, batch, longest = [], [], 0
+    for i in order:
+        longest_if_added = max(longest, int(lengths[i]))
+        if batch and (
+            longest_if_added * (len(batch) + 1) > token_budget or len(batch) >= max_batch_size
+        ):
+            batches.append(batch)
+            batch, longest_if_added = [], int(lengths[i])
+        batch.append(i)
+        longest = longest_if_added
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def padding_efficiency(lengths, batches) -> float:
+    """Real tokens / tokens actually computed (including padding) for a batch plan."""
+    real = sum(int(lengths[i]) for b in batches for i in b)
+    padded = sum(len(b) * max(int(lengths[i]) for i in b) for b in batches)
+    return real / padded if padded else 1.0
+
+
+class LengthGroupedBatchSampler:
+    """Yields the fixed batch plan in a reshuffled order every epoch."""
+
+    def __init__(self, lengths, token_budget: int, max_batch_size: int, seed: int = 0):
+        self.batches = plan_batches(lengths, token_budget, max_batch_size, seed)
+        self.efficiency = padding_efficiency(lengths, self.batches)
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __iter__(self):
+        order = list(range(len(self.batches)))
+        random.Random(self.seed + self.epoch).shuffle(order)
+        self.epoch += 1
+        for i in order:
+            yield self.batches[i]
+
+
+def pad_collate(pad_token_id: int):
+    """Right-pad a batch to its longest sample; padding is masked out of the loss."""
+    def collate(features):
+        import torch
+
+        longest = max(len(f["input_ids"]) for f in features)
+        input_ids = torch.full((len(features), longest), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(features), longest), dtype=torch.long)
+        for row, f in enumerate(features):
+            n = len(f["input_ids"])
+            input_ids[row, :n] = f["input_ids"]
+            attention_mask[row, :n] = 1
+        labels = input_ids.masked_fill(attention_mask == 0, -100)
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
+
+    return collate
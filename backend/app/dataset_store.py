@@ -0,0 +1,135 @@
+# backend/app/dataset_store.py
+"""
+Content-addressed storage for uploaded datasets.
+
+Each distinct file is stored once at DATA_DIR/sha256/<first two hex chars>/<hash>.
+Dataset rows keep the user's original filename (used for format detection) and
+point at the shared blob, so identical uploads cost no extra disk and every
+downstream cache can key on the hash.
+"""
+import hashlib
+import os
+import uuid
+
+from .config import settings
+
+BLOB_ROOT = os.path.join(settings.DATA_DIR, "sha256")
+
+
+def blob_path(content_hash: str) -> str:
+    return os.path.join(BLOB_ROOT, content_hash[:2], content_hash)
+
+
+def has_blob(content_hash: str) -> bool:
+    return os.path.isfile(blob_path(content_hash))
+
+
+def is_sha256(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def commit_file(tmp_path: str, content_hash: str) -> str:
+    """Move a fully written temp file into the store; drops it if the blob already exists."""
+    dest = blob_path(content_hash)
+    if os.path.exists(dest):
+        os.remove(tmp_path)
+        return dest
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    os.replace(tmp_path, dest)   # atomic on the same filesystem
+    return dest
+
+
+def temp_path() -> str:
+    tmp_dir = os.path.join(BLOB_ROOT, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, uuid.uuid4().hex)
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+class BlobWriter:
+    """Write a blob incrementally, hashing as it goes, then commit it into the store."""
+
+    def __init__(self, max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.path = temp_path()
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.discard()
+            raise BlobTooLarge(f"exceeds {self.max_bytes} bytes")
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self):
+        """Returns (content_hash, path)."""
+        self._file.close()
+        content_hash = self._hash.hexdigest()
+        return content_hash, commit_file(self.path, content_hash)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def store_bytes(contents: bytes):
+    """Store contents by hash. Returns (content_hash, path)."""
+    content_hash = hashlib.sha256(contents).hexdigest()
+    if has_blob(content_hash):
+        return content_hash, blob_path(content_hash)
+    tmp = temp_path()
+    with open(tmp, "wb") as f:
+        f.write(contents)
+    return content_hash, commit_file(tmp, content_hash)
+
+
+def original_filename(saved_name: str) -> str:
+    """Strip the '<uuid4>_' prefix that legacy uploads were saved under."""
+    prefix, sep, rest = saved_name.partition("_")
+    if sep and len(prefix) == 36 and prefix.count("-") == 4:
+        return rest
+    return saved_name
+
+
+def backfill(db):
+    """Move legacy per-upload files into the store and point their rows at the blobs."""
+    from . import models
+    from .token_cache import file_sha256
+
+    rows = db.query(models.Dataset).filter(models.Dataset.content_hash.is_(None)).all()
+    freed = 0
+    for ds in rows:
+        if not os.path.isfile(ds.path):
+            print(f"[STORE] Dataset {ds.id}: file missing at {ds.path}, skipped")
+            continue
+        content_hash = file_sha256(ds.path)
+        dest = blob_path(content_hash)
+        if os.path.exists(dest):
+            freed += os.path.getsize(ds.path)
+            os.remove(ds.path)
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(ds.path, dest)
+        ds.content_hash = content_hash
+        ds.path = dest
+        ds.filename = original_filename(ds.filename)
+        db.commit()
+    print(f"[STORE] Backfilled {len(rows)} datasets, freed {freed / 1e6:.1f} MB of duplicates")
+
+
+if __name__ == "__main__":
+    from .db import SessionLocal, ensure_schema
+
+    ensure_schema()
+    session = SessionLocal()
+    try:
+        backfill(session)
+    finally:
+        session.close()
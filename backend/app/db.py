@@ -1,19 +1,143 @@
 # backend/app/db.py
-from sqlalchemy import create_engine
+import threading
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
 
-# echo=False in production set to False
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """Same database through its asyncio driver (psycopg2 -> asyncpg, sqlite -> aiosqlite)."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return u.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def _pool_kwargs(url: str) -> dict:
+    if make_url(url).database in (None, "", ":memory:"):
+        return {}   # in-memory SQLite uses a single-connection pool
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_S,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_S,
+    }
+
+
+def _connect_args(url: str) -> dict:
+    """Per-connection statement timeout, in each driver's own dialect."""
+    u = make_url(url)
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if u.get_backend_name() != "postgresql" or not timeout:
+        return {}
+    if u.get_driver_name() == "asyncpg":
+        return {"server_settings": {"statement_timeout": str(timeout)}}
+    return {"options": f"-c statement_timeout={timeout}"}
+
+
+# Sync engine: Celery worker, schema setup, scripts
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_pre_ping=True,
+    connect_args=_connect_args(settings.DATABASE_URL),
+    **_pool_kwargs(settings.DATABASE_URL)
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: API endpoints
+ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    connect_args=_connect_args(ASYNC_DATABASE_URL),
+    **_pool_kwargs(ASYNC_DATABASE_URL)
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 Base = declarative_base()
 
 
 # Dependency for FastAPI endpoints
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_async_db():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+# -------- Pool metrics -------
+class _PoolCounters:
+    def __init__(self, pool):
+        self.pool = pool
+        self.checkouts = 0
+        self.connects = 0
+        self.in_use_high_water = 0
+        self._in_use = 0
+        self._lock = threading.Lock()
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+
+    def _on_connect(self, *_):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *_):
+        with self._lock:
+            self.checkouts += 1
+            self._in_use += 1
+            self.in_use_high_water = max(self.in_use_high_water, self._in_use)
+
+    def _on_checkin(self, *_):
+        with self._lock:
+            self._in_use = max(0, self._in_use - 1)
+
+    def stats(self) -> dict:
+        pool = self.pool
+        out = {"pool": type(pool).__name__}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                out[name] = getattr(pool, name)()
+        out.update({
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "in_use_high_water": self.in_use_high_water,
+        })
+        return out
+
+
+_sync_pool = _PoolCounters(engine.pool)
+_async_pool = _PoolCounters(async_engine.sync_engine.pool)
+
+
+def pool_stats() -> dict:
+    return {"async": _async_pool.stats(), "sync": _sync_pool.stats()}
+
+
+def ensure_schema():
+    """Add columns and indexes declared on models after their table was first created.
+
+    create_all() only creates missing tables; this covers the additive (nullable)
+    column changes without a migration tool.
+    """
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing:
+                    ddl = col.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl}"))
+                    print(f"[DB] Added column {table.name}.{col.name}")
+            indexed = {ix["name"] for ix in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexed:
+                    index.create(bind=conn)
+                    print(f"[DB] Created index {index.name}")
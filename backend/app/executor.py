@@ -0,0 +1,149 @@
+# backend/app/executor.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from .config import settings
+
+
+class InferenceSaturated(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=429,
+            detail="Inference queue is full, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+class InferenceTimeout(HTTPException):
+    def __init__(self, timeout: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Inference did not finish within {timeout:g}s",
+            headers={"Retry-After": "5"},
+        )
+
+
+class InferenceExecutor:
+    """Dedicated thread pool for model work, with admission control.
+
+    At most max_workers requests run and max_queue wait; anything beyond that is
+    rejected immediately (429) instead of piling up behind the model. Keeping model
+    work here leaves the event loop and the default threadpool free for the rest
+    of the API.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, timeout: float):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+
+        self.admitted = 0       # accepted and not yet finished
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    # ------- Admission -------
+    def admit(self):
+        with self._lock:
+            if self.admitted >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise InferenceSaturated()
+            self.admitted += 1
+
+    def release(self, *_):
+        with self._lock:
+            self.admitted -= 1
+
+    # ------- Execution -------
+    def execute(self, fn, *args, enqueued_at=None, **kwargs):
+        """Run fn on the pool without admission (caller already admitted the work).
+
+        enqueued_at is the monotonic time (or list of times, for a batch) the work
+        was queued, used for wait-time metrics.
+        """
+        if enqueued_at is None:
+            enqueued_at = time.monotonic()
+        queued = enqueued_at if isinstance(enqueued_at, (list, tuple)) else [enqueued_at]
+
+        def _task():
+            started = time.monotonic()
+            with self._lock:
+                self.running += len(queued)
+                for t in queued:
+                    wait = started - t
+                    self.waits += 1
+                    self.wait_seconds_total += wait
+                    self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= len(queued)
+                    self.completed += len(queued)
+                    self.run_seconds_total += time.monotonic() - started
+
+        return self._pool.submit(_task)
+
+    def submit(self, fn, *args, **kwargs):
+        self.admit()
+        try:
+            future = self.execute(fn, *args, **kwargs)
+        except Exception:
+            self.release()
+            raise
+        future.add_done_callback(self.release)
+        return future
+
+    def record_timeout(self):
+        with self._lock:
+            self.timed_out += 1
+
+    async def wait(self, future, timeout: float = None):
+        """Await a pool future; on timeout the work is cancelled if it has not started."""
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or None)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.record_timeout()
+            raise InferenceTimeout(timeout)
+
+    async def run(self, fn, *args, timeout: float = None, **kwargs):
+        return await self.wait(self.submit(fn, *args, **kwargs), timeout)
+
+    # ------- Metrics -------
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "timeout_s": self.timeout,
+                "running": self.running,
+                "queue_depth": max(self.admitted - self.running, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": (
+                    round(self.wait_seconds_total / self.waits * 1000, 1) if self.waits else 0.0
+                ),
+                "max_wait_ms": round(self.wait_seconds_max * 1000, 1),
+                "run_seconds_total": round(self.run_seconds_total, 3),
+            }
+
+
+inference_executor = InferenceExecutor(
+    max_workers=settings.INFER_WORKERS,
+    max_queue=settings.INFER_MAX_QUEUE,
+    timeout=settings.INFER_REQUEST_TIMEOUT_S,
+)
@@ -0,0 +1,103 @@
+# backend/app/form_stream.py
+"""
+multipart/form-data parsed straight off the request stream.
+
+FastAPI's UploadFile is only handed over after Starlette has read the whole
+body and spooled the file part to a temporary file; copying it into the blob
+store then writes every byte a second time, and a size limit can only be
+enforced once the client has finished sending. Here the body is parsed as it
+arrives: the file part goes chunk by chunk into a dataset_store.BlobWriter,
+and the request is rejected as soon as it crosses the limit.
+"""
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:   # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from . import dataset_store
+
+MAX_FIELD_BYTES = 64 * 1024   # plain (non-file) form fields
+
+
+class FormError(ValueError):
+    pass
+
+
+async def receive_file_form(request, file_field: str, max_bytes: int):
+    """Returns (fields, filename, content_hash, path) for a form with one file part.
+
+    Raises dataset_store.BlobTooLarge past max_bytes and FormError for a
+    malformed body; either way nothing is left in the store.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise FormError("Expected a multipart/form-data body")
+
+    fields, filename = {}, None
+    part = {"name": None, "headers": {}, "field": b"", "header": b"", "value": b""}
+    pending = []   # file bytes parsed from the current request chunk
+    writer = dataset_store.BlobWriter(max_bytes)
+    seen_file = False
+
+    def on_header_field(data, start, end):
+        part["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["header"].lower()] = part["value"]
+        part["header"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        nonlocal filename, seen_file
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if part["name"] == file_field:
+            seen_file = True
+            filename = disposition.get(b"filename", b"").decode("utf-8", "replace") or None
+
+    def on_part_data(data, start, end):
+        if part["name"] == file_field:
+            pending.append(data[start:end])
+        else:
+            part["field"] += data[start:end]
+            if len(part["field"]) > MAX_FIELD_BYTES:
+                raise FormError(f"Form field {part['name']!r} is too large")
+
+    def on_part_end():
+        if part["name"] != file_field:
+            fields[part["name"]] = part["field"].decode("utf-8", "replace")
+        part.update(name=None, headers={}, field=b"")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except FormError:
+                raise
+            except Exception as e:
+                raise FormError(f"Malformed multipart body: {e}")
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                await run_in_threadpool(writer.write, data)
+        parser.finalize()
+        if not seen_file:
+            raise FormError(f"Missing file field {file_field!r}")
+    except BaseException:
+        writer.discard()
+        raise
+
+    content_hash, path = await run_in_threadpool(writer.commit)
+    return fields, filename, content_hash, path
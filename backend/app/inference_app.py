@@ -0,0 +1,50 @@
+# backend/app/inference_app.py
+"""
+Inference service: /infer, /predict and /adapters on their own.
+
+    uvicorn app.inference_app:app --port 8001
+
+Runs the model-serving routes in a separate process (typically the GPU box),
+so control-plane replicas (app.main with SERVE_INFERENCE=0) never load the ML
+stack. Both processes share the database and the /data/models volume. Set
+INFER_PRELOAD_MODELS to load bases at startup instead of on the first request.
+"""
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+
+def include_inference_routes(app: FastAPI):
+    from .predict import router as predict_router
+    from .routes import adapters, inference
+
+    app.include_router(predict_router)
+    app.include_router(inference.router)
+    app.include_router(adapters.router)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    names = [m.strip() for m in settings.INFER_PRELOAD_MODELS.split(",") if m.strip()]
+    if names:
+        from .inference_engine import engine
+
+        for name in names:
+            await run_in_threadpool(engine.get_base, name)
+    yield
+
+
+app = FastAPI(title=f"{settings.APP_NAME}-inference", lifespan=lifespan)
+include_inference_routes(app)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # tighten later
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
@@ -0,0 +1,566 @@
+# backend/app/inference_engine.py
+import contextlib
+import gc
+import os
+import threading
+import time
+
+from .artifacts import ADAPTER_ROOT, adapter_dir_for_job
+from .config import settings
+from .resident_cache import ResidentCache
+from .model_loader import load_tokenizer, load_causal_lm
+from . import adapter_merge
+from .adapter_merge import HotAdapterPolicy, merge_adapter, merged_ready
+from .quantize import PRECISIONS, model_bytes, quantize_int8
+from .speculative import SpeculationStats, draft_for, speculate
+
+MB = 1024 * 1024
+
+
+def adapter_name_for_job(job_id: int) -> str:
+    return f"job_{job_id}"
+
+
+class LoadedBase:
+    """A resident base model plus the LoRA adapters attached to it."""
+
+    def __init__(self, base_model: str, tokenizer, model):
+        self.base_model = base_model
+        self.tokenizer = tokenizer
+        self.model = model          # plain model until the first adapter is attached, then a PeftModel
+        self.base_bytes = model.get_memory_footprint()
+        self.adapters = set()       # adapter names currently attached
+        self.pending_detach = set() # evicted while the model was busy; removed on next use
+        # Adapter switching and generate() share mutable model state -> one caller at a time
+        self.lock = threading.RLock()
+
+    @property
+    def device(self):
+        return self.model.device
+
+
+class InferenceEngine:
+    """Long-lived model host: base models stay resident across requests under an LRU budget."""
+
+    def __init__(self):
+        self.bases = ResidentCache(
+            "base_models",
+            max_entries=settings.INFER_MAX_MODELS,
+            max_bytes=settings.INFER_MEMORY_BUDGET_MB * MB,
+            on_evict=self._release,
+        )
+        # One pool across all bases so the total adapter footprint stays bounded
+        self.adapters = ResidentCache(
+            "adapters",
+            max_entries=settings.INFER_MAX_ADAPTERS,
+            max_bytes=settings.INFER_ADAPTER_BUDGET_MB * MB,
+            on_evict=self._on_adapter_evict,
+        )
+        # Hot adapters: full merged copies (base + LoRA folded in), keyed like adapters
+        self.merged = ResidentCache(
+            "merged_models",
+            max_entries=settings.INFER_MAX_MERGED,
+            max_bytes=settings.INFER_MERGED_BUDGET_MB * MB,
+            on_evict=lambda key, entry: self._free_memory(),
+        )
+        # CPU int8 copies per (base, adapter), built from the merged weights
+        self.int8 = ResidentCache(
+            "int8_models",
+            max_entries=settings.INFER_MAX_INT8,
+            max_bytes=settings.INFER_INT8_BUDGET_MB * MB,
+            on_evict=lambda key, entry: self._free_memory(),
+        )
+        # Draft models for speculative decoding: plain bases, never carry adapters
+        self.drafts = ResidentCache(
+            "draft_models",
+            max_entries=settings.INFER_MAX_DRAFTS,
+            on_evict=lambda key, entry: self._free_memory(),
+        )
+        self._draft_unusable = set()   # (target, draft) pairs that failed to load or don't match
+        self.speculation = SpeculationStats()
+        self.merge_policy = HotAdapterPolicy(settings.INFER_MERGE_MIN_REQUESTS, settings.INFER_MERGE_WINDOW_S)
+        self._merging = set()       # keys with a merge in progress
+        self._merge_failed = set()  # not retried until the adapter is unloaded
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.merged_requests = 0
+        self.merge_builds = 0
+        self.int8_requests = 0
+
+    # ------- Base models -------
+    def get_base(self, base_model: str) -> LoadedBase:
+        return self.bases.get_or_load(
+            base_model,
+            lambda: self._load_base(base_model),
+            sizer=lambda entry: entry.base_bytes,
+        )
+
+    def _load_base(self, base_model: str) -> LoadedBase:
+        print(f"[ENGINE] Cold load of base model: {base_model}")
+        # decoder-only models continue from the right edge, so batches pad on the left
+        tokenizer = load_tokenizer(base_model, padding_side="left")
+        return LoadedBase(base_model, tokenizer, self._load_weights(base_model))
+
+    @staticmethod
+    def _load_weights(source: str):
+        """A base model id or a merged-model directory, loaded the same way."""
+        import torch
+        from transformers import BitsAndBytesConfig
+
+        if torch.cuda.is_available():
+            # 4-bit memory efficient loading on GPU
+            bnb_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_compute_dtype=torch.float16
+            )
+            model, _ = load_causal_lm(
+                source,
+                quantization_config=bnb_config,
+                device_map="auto",
+                torch_dtype=torch.float16
+            )
+        else:
+            model, _ = load_causal_lm(source)
+
+        model.eval()
+        return model
+
+    def _release(self, base_model, entry):
+        # Adapters live inside the base model, so they go with it
+        for key in self.adapters.keys():
+            if key[0] == base_model:
+                self.adapters.pop(key, notify=False)
+        self._free_memory()
+
+    @staticmethod
+    def _free_memory():
+        # In-flight requests keep their own reference; memory is returned once they finish.
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    # ------- Adapters -------
+    def _adapter_key(self, base_model: str, job_id: int):
+        return (base_model, adapter_name_for_job(job_id))
+
+    def _attach_adapter(self, entry: LoadedBase, job_id: int) -> str:
+        from peft import PeftModel
+
+        name = adapter_name_for_job(job_id)
+        adapter_dir = adapter_dir_for_job(job_id)
+        if not os.path.isdir(adapter_dir):
+            raise FileNotFoundError(f"Adapter folder not found: {adapter_dir}")
+
+        print(f"[ENGINE] Loading LoRA adapter {name} onto {entry.base_model}")
+        if isinstance(entry.model, PeftModel):
+            entry.model.load_adapter(adapter_dir, adapter_name=name)
+        else:
+            entry.model = PeftModel.from_pretrained(entry.model, adapter_dir, adapter_name=name)
+        entry.model.eval()
+        entry.adapters.add(name)
+        return name
+
+    @staticmethod
+    def _adapter_bytes(entry: LoadedBase, name: str) -> int:
+        marker = f".{name}."
+        return sum(
+            p.numel() * p.element_size()
+            for n, p in entry.model.named_parameters()
+            if marker in n
+        )
+
+    def _detach_adapter(self, entry: LoadedBase, name: str):
+        """Remove an adapter's LoRA weights from the shared base (caller holds entry.lock)."""
+        if name not in entry.adapters:
+            return
+        entry.adapters.discard(name)
+        if entry.adapters:
+            entry.model.delete_adapter(name)
+        else:
+            # Last adapter gone: strip the PEFT wrapper so the base is pristine again
+            base = entry.model.base_model.unload()
+            if hasattr(base, "peft_config"):
+                del base.peft_config
+            entry.model = base
+        print(f"[ENGINE] Unloaded LoRA adapter {name} from {entry.base_model}")
+
+    def _on_adapter_evict(self, key, name):
+        base_model, _ = key
+        entry = self.bases.peek(base_model)
+        if entry is None:
+            return
+        # Never block here: the evicting thread may hold another base's lock
+        if entry.lock.acquire(blocking=False):
+            try:
+                self._detach_adapter(entry, name)
+            finally:
+                entry.lock.release()
+        else:
+            entry.pending_detach.add(name)
+
+    def _flush_pending(self, entry: LoadedBase):
+        while entry.pending_detach:
+            self._detach_adapter(entry, entry.pending_detach.pop())
+
+    def _activate_adapter(self, entry: LoadedBase, job_id):
+        """Make job_id's adapter the active one on entry (caller holds entry.lock).
+
+        Returns a context manager to wrap generation with: a no-op when an adapter is
+        active, or one that disables adapters when the base model should answer alone.
+        """
+        self._flush_pending(entry)
+        if job_id is None:
+            if entry.adapters:
+                return entry.model.disable_adapter()
+            return contextlib.nullcontext()
+
+        key = self._adapter_key(entry.base_model, job_id)
+        name = self.adapters.get_or_load(
+            key,
+            lambda: self._attach_adapter(entry, job_id),
+            sizer=lambda n: self._adapter_bytes(entry, n),
+        )
+        entry.model.set_adapter(name)
+        return contextlib.nullcontext()
+
+    def load_adapter(self, base_model: str, job_id: int) -> dict:
+        """Make an adapter resident ahead of traffic."""
+        entry = self.get_base(base_model)
+        with entry.lock:
+            self._flush_pending(entry)
+            self.adapters.get_or_load(
+                self._adapter_key(base_model, job_id),
+                lambda: self._attach_adapter(entry, job_id),
+                sizer=lambda n: self._adapter_bytes(entry, n),
+            )
+        return {"base_model": base_model, "adapter": adapter_name_for_job(job_id), "loaded": True}
+
+    def unload_adapter(self, base_model: str, job_id: int) -> bool:
+        key = self._adapter_key(base_model, job_id)
+        self._merge_failed.discard(key)
+        merged = self.merged.pop(key) is not None
+        int8 = self.int8.pop(key) is not None
+        return self.adapters.pop(key) is not None or merged or int8
+
+    # ------- Merged hot adapters -------
+    def _entry_for(self, base_model: str, job_id, n: int = 1, precision: str = None):
+        """(entry, adapter to activate on it) for a request.
+
+        int8 requests get their own quantized copy of base + adapter. A hot
+        adapter with a resident merged copy is served from that copy with no
+        adapter at all; one that just turned hot gets merged in the background
+        and keeps going through the shared base until the copy is ready.
+        """
+        if self._resolve_precision(precision) == "int8":
+            with self._stats_lock:
+                self.int8_requests += n
+            return self._get_int8(base_model, job_id), None
+        if job_id is not None and settings.INFER_MERGE_HOT:
+            key = self._adapter_key(base_model, job_id)
+            if self.merge_policy.record(key, n):
+                merged = self.merged.get(key)
+                if merged is not None:
+                    with self._stats_lock:
+                        self.merged_requests += n
+                    return merged, None
+                self._promote(base_model, job_id)
+        return self.get_base(base_model), job_id
+
+    def _promote(self, base_model: str, job_id: int):
+        key = self._adapter_key(base_model, job_id)
+        with self._stats_lock:
+            if key in self._merging or key in self._merge_failed:
+                return
+            self._merging.add(key)
+        threading.Thread(target=self._load_merged, args=(base_model, job_id), daemon=True).start()
+
+    def _load_merged(self, base_model: str, job_id: int) -> LoadedBase:
+        """Make a merged copy of the adapter resident, building it on disk first if needed."""
+        key = self._adapter_key(base_model, job_id)
+
+        def _load():
+            path = self._merged_path(base_model, adapter_dir_for_job(job_id))
+            print(f"[ENGINE] Loading merged model for {key[1]} on {base_model}")
+            return LoadedBase(base_model, load_tokenizer(base_model, padding_side="left"), self._load_weights(path))
+
+        try:
+            return self.merged.get_or_load(key, _load, sizer=lambda entry: entry.base_bytes)
+        except Exception as e:
+            print(f"[ENGINE] Merging {key[1]} into {base_model} failed, serving it as an adapter -> {e}")
+            with self._stats_lock:
+                self._merge_failed.add(key)
+        finally:
+            with self._stats_lock:
+                self._merging.discard(key)
+
+    def _merged_path(self, base_model: str, adapter_dir: str) -> str:
+        """Up-to-date merged copy on disk, built (and older copies evicted past the quota) if missing."""
+        path = merged_ready(base_model, adapter_dir)
+        if path is None:
+            path = merge_adapter(base_model, adapter_dir)
+            with self._stats_lock:
+                self.merge_builds += 1
+            adapter_merge.enforce_quota(ADAPTER_ROOT, protect=(path,))
+        return path
+
+    def merge(self, base_model: str, job_id: int) -> dict:
+        """Promote an adapter to merged serving now, regardless of its request rate."""
+        key = self._adapter_key(base_model, job_id)
+        with self._stats_lock:
+            self._merge_failed.discard(key)
+        if not os.path.isdir(adapter_dir_for_job(job_id)):
+            raise FileNotFoundError(f"Adapter folder not found: {adapter_dir_for_job(job_id)}")
+        if self._load_merged(base_model, job_id) is None:
+            raise RuntimeError(f"Could not merge {key[1]} into {base_model}")
+        return {"base_model": base_model, "adapter": key[1], "merged": True}
+
+    # ------- Int8 CPU copies -------
+    @staticmethod
+    def _resolve_precision(precision: str = None) -> str:
+        import torch
+
+        precision = precision or settings.INFER_PRECISION
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}")
+        # dynamic int8 kernels are CPU-only; GPU bases are already 4-bit
+        if precision == "int8" and torch.cuda.is_available():
+            return "fp32"
+        return precision
+
+    def _get_int8(self, base_model: str, job_id) -> LoadedBase:
+        return self.int8.get_or_load(
+            (base_model, adapter_name_for_job(job_id) if job_id is not None else None),
+            lambda: self._load_int8(base_model, job_id),
+            sizer=lambda entry: entry.base_bytes,
+        )
+
+    def _load_int8(self, base_model: str, job_id) -> LoadedBase:
+        source = base_model
+        if job_id is not None:
+            # quantize the merged weights: no fp32 LoRA matmuls left beside the int8 ones
+            adapter_dir = adapter_dir_for_job(job_id)
+            if not os.path.isdir(adapter_dir):
+                raise FileNotFoundError(f"Adapter folder not found: {adapter_dir}")
+            source = self._merged_path(base_model, adapter_dir)
+        print(f"[ENGINE] Building int8 model from {source}")
+        model, _ = load_causal_lm(source)
+        entry = LoadedBase(base_model, load_tokenizer(base_model, padding_side="left"), quantize_int8(model))
+        entry.base_bytes = model_bytes(entry.model)
+        return entry
+
+    # ------- Speculative decoding -------
+    def _get_draft(self, entry: LoadedBase, batch_size: int):
+        """Resident draft model for entry's family, or None when speculation doesn't apply."""
+        if not settings.INFER_SPECULATIVE or batch_size != 1:
+            return None
+        base_model = entry.base_model
+        name = draft_for(base_model)
+        if name is None or (base_model, name) in self._draft_unusable:
+            return None
+        try:
+            draft = self.drafts.get_or_load(
+                name,
+                lambda: LoadedBase(name, None, self._load_weights(name)),
+                sizer=lambda entry: entry.base_bytes,
+            )
+            if draft.model.config.vocab_size != entry.model.config.vocab_size:
+                raise ValueError("draft and target vocabularies differ")
+            return draft
+        except Exception as e:
+            print(f"[ENGINE] Draft model {name} unusable for {base_model}, decoding normally -> {e}")
+            self._draft_unusable.add((base_model, name))
+            return None
+
+    # ------- Generation -------
+    def generate(self, base_model: str, job_id, prompt: str, precision: str = None, **gen_kwargs) -> str:
+        return self.generate_batch(base_model, job_id, [prompt], precision=precision, **gen_kwargs)[0]
+
+    def generate_batch(self, base_model: str, job_id, prompts, precision: str = None, **gen_kwargs):
+        """Run one model.generate over several prompts (left-padded) for one adapter.
+
+        precision "int8" serves a dynamically quantized copy on CPU; None means INFER_PRECISION.
+        """
+        import torch
+
+        with self._stats_lock:
+            self.requests += len(prompts)
+
+        entry, job_id = self._entry_for(base_model, job_id, len(prompts), precision)
+        tokenizer = entry.tokenizer
+        draft = self._get_draft(entry, len(prompts))
+        with entry.lock:
+            adapter_ctx = self._activate_adapter(entry, job_id)
+            inputs = tokenizer(list(prompts), return_tensors="pt", padding=True)
+            inputs = {k: v.to(entry.device) for k, v in inputs.items()}
+
+            with torch.no_grad(), adapter_ctx, \
+                    speculate(entry.model, draft, self.speculation, base_model) as spec:
+                output = entry.model.generate(
+                    **inputs,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **spec.generate_kwargs,
+                    **gen_kwargs
+                )
+                spec.new_tokens = output.shape[1] - inputs["input_ids"].shape[1]
+
+        return tokenizer.batch_decode(output, skip_special_tokens=True)
+
+    def stream_generate(self, base_model: str, job_id, prompt: str, cancel=None, spawn=None,
+                        precision: str = None, **gen_kwargs):
+        """Yield {"token": text} events while generating, then one final stats event.
+
+        Setting the `cancel` threading.Event stops generation at the next token and
+        releases the model for other requests. `spawn(fn)` schedules the generation
+        and returns a future (e.g. InferenceExecutor.execute); by default it runs on
+        a dedicated thread.
+        """
+        import torch
+        from transformers import TextIteratorStreamer, StoppingCriteria, StoppingCriteriaList
+
+        class _TimedStreamer(TextIteratorStreamer):
+            first_token_at = None
+            generated = 0
+
+            def put(self, value):
+                is_prompt = self.skip_prompt and self.next_tokens_are_prompt
+                super().put(value)
+                if not is_prompt:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.perf_counter()
+                    self.generated += value.numel()
+
+        class _Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full(
+                    (input_ids.shape[0],), cancel.is_set(), dtype=torch.bool, device=input_ids.device
+                )
+
+        cancel = cancel or threading.Event()
+        with self._stats_lock:
+            self.requests += 1
+
+        entry, job_id = self._entry_for(base_model, job_id, precision=precision)
+        tokenizer = entry.tokenizer
+        streamer = _TimedStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        draft = self._get_draft(entry, 1)
+        speculation = []
+        errors = []
+
+        def _run():
+            if cancel.is_set():     # client left while we were queued
+                streamer.end()
+                return
+            try:
+                with entry.lock:
+                    adapter_ctx = self._activate_adapter(entry, job_id)
+                    inputs = tokenizer(prompt, return_tensors="pt")
+                    inputs = {k: v.to(entry.device) for k, v in inputs.items()}
+                    with torch.no_grad(), adapter_ctx, \
+                            speculate(entry.model, draft, self.speculation, base_model) as spec:
+                        entry.model.generate(
+                            **inputs,
+                            streamer=streamer,
+                            stopping_criteria=StoppingCriteriaList([_Cancelled()]),
+                            pad_token_id=tokenizer.pad_token_id,
+                            **spec.generate_kwargs,
+                            **gen_kwargs
+                        )
+                        spec.new_tokens = streamer.generated
+                    speculation.append(spec)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        start = time.perf_counter()
+        if spawn is None:
+            worker = threading.Thread(target=_run, daemon=True)
+            worker.start()
+            wait_done = worker.join
+        else:
+            wait_done = spawn(_run).result
+
+        pieces = []
+        try:
+            for piece in streamer:
+                if piece:
+                    pieces.append(piece)
+                    yield {"token": piece}
+        except GeneratorExit:
+            # Consumer went away (client disconnect) -> stop generating
+            cancel.set()
+            raise
+        wait_done()
+
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        ttft = (streamer.first_token_at - start) if streamer.first_token_at else None
+        # decode rate excludes the prefill that produced the first token
+        decode_time = elapsed - ttft if ttft is not None else 0.0
+        decoded = max(streamer.generated - 1, 0)
+        yield {
+            "done": True,
+            "text": prompt + "".join(pieces),
+            "cancelled": cancel.is_set(),
+            "tokens": streamer.generated,
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "tokens_per_sec": (
+                round(decoded / decode_time, 2) if decoded and decode_time > 0 else None
+            ),
+            "total_ms": round(elapsed * 1000, 1),
+            "speculative": speculation[0].summary() if speculation else None,
+        }
+
+    # ------- Metrics -------
+    def stats(self) -> dict:
+        base_stats = self.bases.stats()
+        adapter_stats = self.adapters.stats()
+        merged_stats = self.merged.stats()
+        int8_stats = self.int8.stats()
+        draft_stats = self.drafts.stats()
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "base_models": {
+                    **base_stats,
+                    "cold_loads": base_stats["misses"],
+                    "warm_hits": base_stats["hits"],
+                },
+                "adapters": {
+                    **adapter_stats,
+                    "cold_loads": adapter_stats["misses"],
+                    "warm_hits": adapter_stats["hits"],
+                },
+                "merged": {
+                    **merged_stats,
+                    "enabled": settings.INFER_MERGE_HOT,
+                    "min_requests": self.merge_policy.min_requests,
+                    "window_s": self.merge_policy.window_s,
+                    "requests": self.merged_requests,
+                    "builds": self.merge_builds,
+                    "building": [str(k) for k in self._merging],
+                    "failed": [str(k) for k in self._merge_failed],
+                    "recent_requests": self.merge_policy.counts(),
+                },
+                "int8": {
+                    **int8_stats,
+                    "default_precision": settings.INFER_PRECISION,
+                    "requests": self.int8_requests,
+                },
+                "speculative": {
+                    **draft_stats,
+                    "enabled": settings.INFER_SPECULATIVE,
+                    "unusable": [str(k) for k in self._draft_unusable],
+                    "targets": self.speculation.stats(),
+                },
+            }
+
+
+engine = InferenceEngine()
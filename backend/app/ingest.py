@@ -0,0 +1,308 @@
+# backend/app/ingest.py
+"""
+Dataset ingestion: raw upload -> normalized UTF-8 text shards.
+
+Supported inputs are plain text, JSON Lines (text fields are extracted) and
+.docx (paragraph text from word/document.xml). The encoding is detected once
+from a bounded prefix; large text/jsonl files are split at line boundaries into
+byte ranges that are decoded and normalized in parallel by a process pool
+(billiard's inside a Celery worker, whose pool children are daemonic).
+
+Shards are cached under INGEST_CACHE_DIR/<corpus hash>/ and are what the token
+caches read (see token_cache.py). In the output, documents are separated by a
+blank line; plain-text inputs keep their own line structure.
+"""
+import codecs
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import unicodedata
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+from .config import settings
+from .token_cache import detect_encoding, file_sha256, READ_CHUNK_BYTES
+
+# bump when the extraction output changes so downstream caches are rebuilt
+INGEST_VERSION = 1
+
+JSON_TEXT_FIELDS = ("text", "content", "body")
+JSON_PAIR_FIELDS = (("prompt", "completion"), ("instruction", "output"), ("question", "answer"))
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# control characters other than \t and \n are dropped from the text
+_CONTROL = dict.fromkeys(c for c in range(32) if c not in (9, 10))
+
+
+def detect_format(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".docx":
+        return "docx"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "txt"
+
+
+def resolve_format(path: str, filename: str = None) -> str:
+    """detect_format, with a .docx that is not a zip read as plain text."""
+    fmt = detect_format(filename or path)
+    if fmt == "docx" and not zipfile.is_zipfile(path):
+        fmt = "txt"
+    return fmt
+
+
+def corpus_hash(content_hash: str, fmt: str) -> str:
+    """Identity of the ingested output: raw content + how it is parsed + extraction version.
+
+    The same bytes uploaded as .txt and as .jsonl yield different text.
+    """
+    return hashlib.sha256(f"{content_hash}:{fmt}:ingest-v{INGEST_VERSION}".encode()).hexdigest()
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", text.replace("\r\n", "\n").replace("\r", "\n")).translate(_CONTROL)
+
+
+# -------- Sharding -------
+def _splittable(encoding: str) -> bool:
+    """Byte ranges can start at any b'\\n' only in ASCII-compatible encodings."""
+    name = codecs.lookup(encoding).name
+    return not name.startswith(("utf-16", "utf-32"))
+
+
+def split_ranges(path: str, target_bytes: int):
+    """[(start, end)] byte ranges of ~target_bytes that begin right after a newline.
+
+    A blank line (document break) close to the cut point is preferred over a
+    single newline so documents are rarely split across shards.
+    """
+    size = os.path.getsize(path)
+    cuts = [0]
+    with open(path, "rb") as f:
+        pos = target_bytes
+        while pos < size:
+            f.seek(pos)
+            window = f.read(READ_CHUNK_BYTES)
+            at = window.find(b"\n\n")
+            at = at + 2 if at >= 0 else window.find(b"\n") + 1
+            if at <= 0:   # no newline within a chunk; extend this range
+                pos += READ_CHUNK_BYTES
+                continue
+            if pos + at < size:
+                cuts.append(pos + at)
+            pos = pos + at + target_bytes
+    cuts.append(size)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _iter_range_text(path: str, start: int, end: int, encoding: str):
+    """Decode bytes [start, end) incrementally, yielding normalized text pieces."""
+    if start > 0 and encoding == "utf-8-sig":
+        encoding = "utf-8"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    pending_cr = ""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(READ_CHUNK_BYTES, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            text = pending_cr + decoder.decode(block)
+            # keep a trailing \r until we know whether \n follows
+            pending_cr = "\r" if text.endswith("\r") else ""
+            text = text[:-1] if pending_cr else text
+            if text:
+                yield normalize(text)
+    tail = pending_cr + decoder.decode(b"", final=True)
+    if tail:
+        yield normalize(tail)
+
+
+def _iter_lines(pieces):
+    carry = ""
+    for piece in pieces:
+        lines = (carry + piece).split("\n")
+        carry = lines.pop()
+        yield from lines
+    if carry:
+        yield carry
+
+
+# -------- Extractors (run in pool workers; module-level so they pickle) -------
+def extract_json_text(record) -> str:
+    if isinstance(record, str):
+        return record
+    if not isinstance(record, dict):
+        return ""
+    for field in JSON_TEXT_FIELDS:
+        if isinstance(record.get(field), str):
+            return record[field]
+    for a, b in JSON_PAIR_FIELDS:
+        if isinstance(record.get(a), str) and isinstance(record.get(b), str):
+            head = record[a]
+            if isinstance(record.get("input"), str) and record["input"]:
+                head = f"{head}\n{record['input']}"
+            return f"{head}\n{record[b]}"
+    messages = record.get("messages")
+    if isinstance(messages, list):
+        return "\n".join(
+            m["content"] for m in messages if isinstance(m, dict) and isinstance(m.get("content"), str)
+        )
+    return ""
+
+
+def _write_txt(path, start, end, encoding, out):
+    n = 0
+    for piece in _iter_range_text(path, start, end, encoding):
+        out.write(piece)
+        n += len(piece)
+    return n, 0
+
+
+def _write_jsonl(path, start, end, encoding, out):
+    n, skipped = 0, 0
+    for line in _iter_lines(_iter_range_text(path, start, end, encoding)):
+        if not line.strip():
+            continue
+        try:
+            text = normalize(extract_json_text(json.loads(line))).strip()
+        except ValueError:
+            skipped += 1
+            continue
+        if text:
+            out.write(text + "\n\n")
+            n += len(text) + 2
+        else:
+            skipped += 1
+    return n, skipped
+
+
+def _write_docx(path, start, end, encoding, out):
+    n = 0
+    with zipfile.ZipFile(path) as z, z.open("word/document.xml") as xml:
+        parts = []
+        for _, el in ElementTree.iterparse(xml, events=("end",)):
+            if el.tag == W_NS + "r":   # a run; tab stops in paragraph properties are not text
+                for child in el:
+                    if child.tag == W_NS + "t" and child.text:
+                        parts.append(child.text)
+                    elif child.tag == W_NS + "tab":
+                        parts.append("\t")
+                    elif child.tag in (W_NS + "br", W_NS + "cr"):
+                        parts.append("\n")
+            elif el.tag == W_NS + "p":
+                text = normalize("".join(parts)).strip()
+                parts = []
+                if text:
+                    out.write(text + "\n")
+                    n += len(text) + 1
+                el.clear()   # paragraphs are done with; keep memory flat on big documents
+    return n, 0
+
+
+_WRITERS = {"txt": _write_txt, "jsonl": _write_jsonl, "docx": _write_docx}
+
+
+def _ingest_shard(task):
+    fmt, path, start, end, encoding, out_path = task
+    with open(out_path, "w", encoding="utf-8") as out:
+        n_chars, skipped = _WRITERS[fmt](path, start, end, encoding, out)
+    return os.path.basename(out_path), n_chars, skipped
+
+
+# -------- Pool -------
+def _workers() -> int:
+    return settings.INGEST_WORKERS or os.cpu_count() or 1
+
+
+def _run_tasks(tasks):
+    workers = min(_workers(), len(tasks))
+    if workers > 1:
+        try:
+            if multiprocessing.current_process().daemon:
+                # a Celery prefork child: the stdlib refuses to fork from a daemonic
+                # process, billiard (Celery's multiprocessing fork) does not
+                import billiard
+                with billiard.Pool(workers) as pool:
+                    return pool.map(_ingest_shard, tasks), workers
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(_ingest_shard, tasks)), workers
+        except (OSError, AssertionError, ImportError) as e:
+            print(f"[INGEST] Process pool unavailable ({e}); ingesting serially")
+    return [_ingest_shard(t) for t in tasks], 1
+
+
+class Corpus:
+    """Ingested dataset: an ordered list of UTF-8 text shards."""
+
+    def __init__(self, cache_dir: str):
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.cache_dir = cache_dir
+        self.content_hash = self.meta["corpus_hash"]
+        self.shards = [os.path.join(cache_dir, s) for s in self.meta["shards"]]
+
+
+def ingest_dataset(path: str, filename: str = None, content_hash: str = None) -> Corpus:
+    """Ingest `path` once (cached by content hash and format) and return its Corpus."""
+    content_hash = content_hash or file_sha256(path)
+    fmt = resolve_format(path, filename)
+    key = corpus_hash(content_hash, fmt)
+    cache_dir = os.path.join(settings.INGEST_CACHE_DIR, key[:32])
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        print(f"[INGEST] Cache hit: {cache_dir}")
+        return Corpus(cache_dir)
+
+    encoding = None if fmt == "docx" else detect_encoding(path)
+
+    if fmt == "docx" or not _splittable(encoding):
+        ranges = [(0, os.path.getsize(path))]
+    else:
+        ranges = split_ranges(path, settings.INGEST_SHARD_MB * 1024 * 1024)
+
+    tmp_dir = f"{cache_dir}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        tasks = [
+            (fmt, path, a, b, encoding, os.path.join(tmp_dir, f"shard_{i:05d}.txt"))
+            for i, (a, b) in enumerate(ranges)
+        ]
+        results, workers = _run_tasks(tasks)
+        meta = {
+            "corpus_hash": key,
+            "content_hash": content_hash,
+            "ingest_version": INGEST_VERSION,
+            "format": fmt,
+            "encoding": encoding,
+            "shards": [name for name, _, _ in results],
+            "n_chars": sum(n for _, n, _ in results),
+            "skipped_records": sum(s for _, _, s in results),
+            "workers": workers,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        if meta["n_chars"] == 0:
+            raise ValueError(f"No text could be extracted from {filename or path} ({fmt})")
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        try:
+            os.replace(tmp_dir, cache_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)   # a concurrent ingest won
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    print(
+        f"[INGEST] {fmt} ({encoding or 'zip'}) -> {len(meta['shards'])} shards, "
+        f"{meta['n_chars']} chars in {meta['seconds']}s on {workers} workers"
+    )
+    return Corpus(cache_dir)
@@ -0,0 +1,182 @@
+# backend/app/job_spec.py
+"""
+The training recipe, and a fingerprint of everything that determines a job's output.
+
+lora_train reads its LoRA / TrainingArguments values from here, so the
+fingerprint cannot drift from what actually runs. Two jobs with the same
+fingerprint train the same base revision on the same bytes with the same
+config, hardware profile and seed; the scheduler uses that to reuse a
+completed adapter or to attach a duplicate submission to the job already
+training it.
+"""
+import hashlib
+import json
+import os
+
+from .config import settings
+from .ingest import INGEST_VERSION
+from .model_cache import read_manifest
+
+# bump whenever a change to training code alters the adapters it produces
+SPEC_VERSION = 1
+
+TRAIN_SEED = 42
+
+LORA = {"r": 8, "lora_alpha": 16, "lora_dropout": 0.05, "bias": "none", "task_type": "CAUSAL_LM"}
+TRAIN_HPARAMS = {
+    "per_device_train_batch_size": 1,
+    "gradient_accumulation_steps": 4,
+    "learning_rate": 2e-4,
+    "seed": TRAIN_SEED,
+}
+
+# -------- Hardware profiles: how the base is loaded and what the optimizer runs in -------
+# The profile name is also the warm-cache variant key (training_cache.checkout_base).
+QLORA_VARIANT = "qlora-nf4"   # GPU: 4-bit NF4 base via bitsandbytes, paged optimizer
+CPU_BF16 = "cpu-bf16"         # CPU with native bf16 (AVX512-BF16 / AMX): fp32 weights, bf16 autocast
+CPU_FP32 = "cpu-fp32"         # any other CPU: plain fp32
+
+TRAIN_PROFILES = {
+    QLORA_VARIANT: {"device": "cuda", "quantize": "nf4", "optim": "paged_adamw_32bit"},
+    CPU_BF16: {"device": "cpu", "quantize": None, "optim": "adamw_torch", "bf16": True},
+    CPU_FP32: {"device": "cpu", "quantize": None, "optim": "adamw_torch", "bf16": False},
+}
+
+
+def cpu_has_bf16() -> bool:
+    """True when the CPU has bf16 matmul instructions (otherwise bf16 autocast is slower than fp32)."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = next((line for line in f if line.startswith("flags")), "").split()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def select_profile(cuda: bool) -> str:
+    """TRAIN_PROFILE when set, else QLoRA on GPU and the best CPU profile otherwise."""
+    if settings.TRAIN_PROFILE != "auto":
+        if settings.TRAIN_PROFILE not in TRAIN_PROFILES:
+            raise ValueError(f"TRAIN_PROFILE must be auto or one of {sorted(TRAIN_PROFILES)}")
+        return settings.TRAIN_PROFILE
+    if cuda:
+        return QLORA_VARIANT
+    return CPU_BF16 if cpu_has_bf16() else CPU_FP32
+
+
+def queue_profile(queue: str) -> str:
+    """Profile that jobs on `queue` train with: TRAIN_PROFILE when set, else TRAIN_QUEUE_PROFILES.
+
+    Configuration rather than detection: the API fingerprints with it and sees
+    neither the workers' GPUs nor their CPU flags.
+    """
+    if settings.TRAIN_PROFILE != "auto":
+        return select_profile(cuda=False)   # the override, validated
+    profiles = {}
+    for pair in settings.TRAIN_QUEUE_PROFILES.split(","):
+        if "=" in pair:
+            name, profile = (p.strip() for p in pair.split("=", 1))
+            profiles[name] = profile
+    if profiles.get(queue) not in TRAIN_PROFILES:
+        raise ValueError(
+            f"TRAIN_QUEUE_PROFILES needs one of {sorted(TRAIN_PROFILES)} for queue {queue!r}"
+        )
+    return profiles[queue]
+
+
+# -------- Choose LoRA target modules depending on model ------
+def get_lora_target_modules(model_name):
+    name = model_name.lower()
+
+    # GPT-2 family
+    if "gpt2" in name and "distil" not in name:
+        return ["c_attn", "c_proj"]
+
+    # DistilGPT2
+    if "distilgpt2" in name:
+        return ["c_attn", "c_proj"]
+
+    # GPT-Neo family
+    if "gpt-neo" in name:
+        return ["attention.query_key_value"]
+
+    # Pythia family
+    if "pythia" in name:
+        return ["q_proj", "k_proj", "v_proj"]
+
+    # Phi-1.5 / Phi-2
+    if "phi" in name:
+        return ["q_proj", "k_proj", "v_proj", "o_proj"]
+
+    # Qwen small models (GPT-like)
+    if "qwen" in name:
+        return ["c_attn", "c_proj"]
+
+    # Falcon 1B
+    if "falcon" in name:
+        return ["query_key_value"]
+
+    # LLaMA / Mistral / Gemma
+    if "llama" in name or "mistral" in name or "gemma" in name:
+        return ["q_proj", "k_proj", "v_proj", "o_proj"]
+
+    else:
+        return ["q_proj", "v_proj"]  # fallback-safe
+
+
+def base_revision(base_model: str) -> str:
+    """Revision of `base_model` in the model store, else of the cached Hub snapshot;
+    "main" until it is downloaded.
+
+    Read from the store manifest or the HF cache's refs/main, so no network call
+    is made. The worker fingerprints again after the load, when the revision is
+    always known, and records that as Job.trained_fingerprint.
+    """
+    if os.path.isdir(base_model):
+        return "local"
+    stored = read_manifest(base_model)
+    if stored:
+        return stored["revision"]
+    ref = os.path.join(settings.MODEL_CACHE_DIR, "models--" + base_model.replace("/", "--"), "refs", "main")
+    try:
+        with open(ref) as f:
+            return f.read().strip() or "main"
+    except OSError:
+        return "main"
+
+
+def training_spec(content_hash: str, data_format: str, base_model: str, epochs: int, data_mode: str,
+                  profile: str) -> dict:
+    # the format decides how the bytes are parsed (ingest.resolve_format): same bytes, other text
+    data = {
+        "format": data_format, "mode": data_mode, "block_size": settings.TRAIN_BLOCK_SIZE,
+        "ingest_version": INGEST_VERSION,
+    }
+    if data_mode == "bucketed":
+        data.update(
+            tokens_per_batch=settings.TRAIN_TOKENS_PER_BATCH, max_batch_size=settings.TRAIN_MAX_BATCH_SIZE
+        )
+    return {
+        "spec_version": SPEC_VERSION,
+        "dataset": content_hash,
+        "base_model": base_model,
+        "base_revision": base_revision(base_model),
+        "profile": {"name": profile, **TRAIN_PROFILES[profile]},
+        "lora": {**LORA, "target_modules": get_lora_target_modules(base_model)},
+        "train": {**TRAIN_HPARAMS, "num_train_epochs": epochs},
+        "data": data,
+    }
+
+
+def fingerprint(spec: dict) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def job_fingerprint(content_hash: str, data_format: str, base_model: str, epochs: int, data_mode: str,
+                    profile: str):
+    """None for legacy datasets that have no content hash (never deduplicated)."""
+    if not content_hash:
+        return None
+    return fingerprint(
+        training_spec(content_hash, data_format, base_model, epochs, data_mode or "packed", profile)
+    )
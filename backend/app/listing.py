@@ -0,0 +1,88 @@
+# backend/app/listing.py
+"""
+Keyset pagination + conditional responses for list endpoints.
+
+Pages are ordered by id descending; the opaque cursor is the last id served,
+so each page is an index range scan no matter how deep the client pages.
+List bodies stay plain JSON arrays; the next page's cursor goes in the
+X-Next-Cursor header. The ETag is a hash of the projected row values, checked
+against If-None-Match before anything is serialized.
+"""
+import base64
+import hashlib
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+LIST_HEADERS = {"Cache-Control": "no-cache"}   # always revalidate; unchanged lists cost a 304
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, _, value = raw.partition(":")
+        if prefix != "id":
+            raise ValueError(raw)
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: str, default, allowed) -> list:
+    """Comma-separated column list from the client, checked against `allowed`.
+
+    The id always comes first: pagination and the ETag are keyed on it.
+    """
+    if not fields:
+        return list(default)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}; allowed: {sorted(allowed)}")
+    return ["id"] + [f for f in names if f != "id"]
+
+
+async def keyset_page(db, stmt, id_column, cursor: str = None, limit: int = DEFAULT_LIMIT):
+    """Rows of one page of a select() (newest first) and the next page's cursor, if any."""
+    limit = max(1, min(limit, MAX_LIMIT))
+    if cursor:
+        stmt = stmt.where(id_column < decode_cursor(cursor))
+    rows = (await db.execute(stmt.order_by(id_column.desc()).limit(limit + 1))).all()
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _etag(rows, next_cursor) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        h.update(repr(tuple(row)).encode())
+    h.update(repr(next_cursor).encode())
+    return f'"{h.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def list_response(request: Request, rows, to_item, next_cursor: str = None) -> Response:
+    """200 with the serialized page, or 304 when the client's ETag still matches.
+
+    Rows must start with the id column (keyset_page relies on that too).
+    """
+    etag = _etag(rows, next_cursor)
+    headers = {**LIST_HEADERS, "ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder([to_item(r) for r in rows]), headers=headers)
@@ -1,75 +1,40 @@
 import os
-import torch
-from transformers import (
-    AutoTokenizer,
-    AutoModelForCausalLM,
-    BitsAndBytesConfig
-)
-from peft import PeftModel
-
-
-def generate_text(base_model: str, job_id: int, prompt: str):
-    print(f"[INF] Inference started: model={base_model}, job={job_id}")
-
-    # ✅ Adapter path
-    adapter_path = f"/data/models/job_{job_id}/adapter"
-    if not os.path.exists(adapter_path):
-        raise FileNotFoundError(f"Adapter folder not found: {adapter_path}")
 
-    # ✅ Use HF token if available (needed for LLaMA/Mistral/Qwen gated)
-    token = os.getenv("HF_TOKEN")
-    token_kwargs = {"use_auth_token": token} if token else {}
+from .inference_engine import engine, adapter_dir_for_job
 
-    # ✅ Load tokenizer safely
-    tokenizer = AutoTokenizer.from_pretrained(base_model, **token_kwargs)
 
-    # fix no pad token issue
-    if tokenizer.pad_token is None:
-        tokenizer.pad_token = tokenizer.eos_token
+GEN_KWARGS = dict(
+    max_new_tokens=150,
+    temperature=0.8,
+    do_sample=True,
+    top_p=0.9
+)
 
-    # ✅ 4-bit memory efficient loading
-    bnb_config = BitsAndBytesConfig(
-        load_in_4bit=True,
-        bnb_4bit_quant_type="nf4",
-        bnb_4bit_use_double_quant=True,
-        bnb_4bit_compute_dtype=torch.float16
-    )
 
-    # ✅ Load base model
-    print("[INF] Loading base model…")
-    model = AutoModelForCausalLM.from_pretrained(
-        base_model,
-        quantization_config=bnb_config,
-        device_map="auto",
-        torch_dtype=torch.float16,
-        **token_kwargs
-    )
+def _check_adapter(job_id: int):
+    adapter_path = adapter_dir_for_job(job_id)
+    if not os.path.exists(adapter_path):
+        raise FileNotFoundError(f"Adapter folder not found: {adapter_path}")
 
-    # ✅ Load LoRA adapter
-    print("[INF] Loading LoRA adapter…")
-    model = PeftModel.from_pretrained(
-        model,
-        adapter_path,
-        **token_kwargs
-    )
 
-    model.eval()
+def generate_text(base_model: str, job_id: int, prompt: str, precision: str = None):
+    print(f"[INF] Inference started: model={base_model}, job={job_id}")
 
-    # ✅ Tokenize & move to correct device
-    inputs = tokenizer(prompt, return_tensors="pt")
-    inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    # ✅ Adapter path
+    _check_adapter(job_id)
 
+    # ✅ Base model + adapter stay resident in the engine between requests
     print("[INF] Generating output…")
-    with torch.no_grad():
-        output = model.generate(
-            **inputs,
-            max_new_tokens=150,
-            temperature=0.8,
-            do_sample=True,
-            top_p=0.9
-        )
-
-    text = tokenizer.decode(output[0], skip_special_tokens=True)
+    text = engine.generate(base_model, job_id, prompt, precision=precision, **GEN_KWARGS)
     print("[INF] Inference complete")
 
     return text
+
+
+def stream_text(base_model: str, job_id: int, prompt: str, cancel=None, spawn=None, precision: str = None):
+    """Same generation as generate_text, yielded token by token (see engine.stream_generate)."""
+    print(f"[INF] Streaming inference started: model={base_model}, job={job_id}")
+    _check_adapter(job_id)
+    return engine.stream_generate(
+        base_model, job_id, prompt, cancel=cancel, spawn=spawn, precision=precision, **GEN_KWARGS
+    )
@@ -1,175 +1,255 @@
 import os
 import json
-import zipfile
+import shutil
 import torch
-import chardet
 from transformers import (
-    AutoTokenizer,
-    AutoModelForCausalLM,
     TrainingArguments,
     Trainer,
-    DataCollatorForLanguageModeling,
-    BitsAndBytesConfig
+    TrainerState,
+    BitsAndBytesConfig,
+    default_data_collator
 )
+from transformers.trainer_utils import get_last_checkpoint
 from peft import LoraConfig, get_peft_model, PeftModel, prepare_model_for_kbit_training
-from datasets import Dataset
 
 from .db import SessionLocal
+from . import artifacts
+from .config import settings
+from .ingest import ingest_dataset
+from .telemetry import TelemetryCallback
+from .token_cache import build_token_blocks, build_sample_cache, PackedBlockDataset
+from .bucketing import SampleDataset, LengthGroupedBatchSampler, pad_collate
+from .model_loader import load_config
+from .training_cache import tokenizer_for, checkout_base, checkin_base
+from .job_spec import (
+    LORA, TRAIN_HPARAMS, TRAIN_PROFILES, get_lora_target_modules, job_fingerprint, queue_profile, select_profile
+)
+from .scheduler import QUEUE_SMALL, QUEUE_LARGE
 from . import models
 
 
-# -------- Detect encoding & read dataset safely -------
-def read_text_file(path):
-    with open(path, "rb") as f:
-        raw = f.read()
-    enc = chardet.detect(raw)["encoding"] or "utf-8"
-    return raw.decode(enc, errors="ignore")
-
-
-# -------- Choose LoRA target modules depending on model ------
-def get_lora_target_modules(model_name):
-    name = model_name.lower()
-
-    # GPT-2 family
-    if "gpt2" in name and "distil" not in name:
-        return ["c_attn", "c_proj"]
-
-    # DistilGPT2
-    if "distilgpt2" in name:
-        return ["c_attn", "c_proj"]
-
-    # GPT-Neo family
-    if "gpt-neo" in name:
-        return ["attention.query_key_value"]
-
-    # Pythia family
-    if "pythia" in name:
-        return ["q_proj", "k_proj", "v_proj"]
-
-    # Phi-1.5 / Phi-2
-    if "phi" in name:
-        return ["q_proj", "k_proj", "v_proj", "o_proj"]
-
-    # Qwen small models (GPT-like)
-    if "qwen" in name:
-        return ["c_attn", "c_proj"]
-
-    # Falcon 1B
-    if "falcon" in name:
-        return ["query_key_value"]
-
-    # LLaMA / Mistral / Gemma
-    if "llama" in name or "mistral" in name or "gemma" in name:
-        return ["q_proj", "k_proj", "v_proj", "o_proj"]
-    
-    else:
-        return ["q_proj", "v_proj"]  # fallback-safe
-
-
-# -------- Train on job ----------
-def train_on_job(job_id: int, dataset_id: int, base_model: str, epochs: int):
-
-    db = SessionLocal()
-    dataset = db.query(models.Dataset).filter(models.Dataset.id == dataset_id).first()
-    db.close()
-
-    ds_path = dataset.path
-    print(f"[job {job_id}] Loading dataset from {ds_path}")
-
-    text = read_text_file(ds_path)
-    dataset = Dataset.from_dict({"text": [text]})
-
-    print(f"[job {job_id}] Loaded dataset, {len(dataset)} samples")
+class BucketedTrainer(Trainer):
+    """Trainer that draws batches from a length-grouped batch sampler."""
 
-    # ------- GPU / CPU device check -------
-    device_label = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"[job {job_id}] CUDA: {torch.cuda.is_available()} | Device: {device_label}")
+    def __init__(self, *args, batch_sampler=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_sampler = batch_sampler
 
-    # ------- Load tokenizer -------
-    hf_token = os.getenv("HF_TOKEN")
-    token_kwargs = {"use_auth_token": hf_token} if hf_token else {}
+    def get_train_dataloader(self):
+        from torch.utils.data import DataLoader
 
-    tokenizer = AutoTokenizer.from_pretrained(base_model, **token_kwargs)
-    model = AutoModelForCausalLM.from_pretrained(base_model, **token_kwargs)
+        dataloader = DataLoader(
+            self.train_dataset,
+            batch_sampler=self.batch_sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(dataloader)
 
-    if tokenizer.pad_token is None:
-        tokenizer.pad_token = tokenizer.eos_token
-        model.config.pad_token_id = model.config.eos_token_id
 
+def _update_job(job_id: int, **fields):
+    with SessionLocal() as db:
+        db.query(models.Job).filter(models.Job.id == job_id).update(fields)
+        db.commit()
 
-    # ------- Tokenize dataset -------
-    def tokenize(batch):
-        return tokenizer(batch["text"], truncation=True, padding="max_length", max_length=512)
 
-    dataset = dataset.map(tokenize, batched=True)
-
-    # ------- BitsAndBytes 4-bit QLoRA config -------
+# -------- Load recipe + precision per hardware profile (job_spec.TRAIN_PROFILES) -------
+def qlora_load_kwargs() -> dict:
     bnb_config = BitsAndBytesConfig(
         load_in_4bit=True,
         bnb_4bit_compute_dtype=torch.float16,
         bnb_4bit_quant_type="nf4",
         bnb_4bit_use_double_quant=True,
     )
+    return {"quantization_config": bnb_config, "device_map": "auto"}
+
+
+def profile_load_kwargs(profile: str) -> dict:
+    if TRAIN_PROFILES[profile]["quantize"]:
+        return qlora_load_kwargs()
+    # no bitsandbytes on CPU; bf16 runs as autocast over the fp32 weights
+    return {"torch_dtype": torch.float32}
+
+
+def profile_training_args(profile: str) -> dict:
+    """Device, mixed precision and optimizer arguments for TrainingArguments."""
+    recipe = TRAIN_PROFILES[profile]
+    if recipe["device"] == "cuda":
+        bf16 = torch.cuda.is_bf16_supported()
+        return {"bf16": bf16, "fp16": not bf16, "optim": recipe["optim"]}
+    return {
+        "use_cpu": True,
+        "bf16": recipe["bf16"],
+        "fp16": False,   # fp16 autocast on CPU is emulated and slow
+        "optim": recipe["optim"],
+        "torch_compile": settings.TRAIN_TORCH_COMPILE,
+        "dataloader_pin_memory": False,
+    }
+
+
+def worker_profile(queue: str) -> str:
+    """The queue's configured profile (job_spec.queue_profile), unless it needs a GPU
+    this host lacks: then the best CPU profile, which the job records instead."""
+    profile = queue_profile(queue)
+    if TRAIN_PROFILES[profile]["device"] == "cuda" and not torch.cuda.is_available():
+        fallback = select_profile(cuda=False)
+        print(f"[TRAIN] {queue} is configured for {profile} but there is no GPU; using {fallback}")
+        return fallback
+    return profile
+
+
+def preload_bases(base_models):
+    """Load bases into the worker's warm cache ahead of the first job."""
+    # GPU workers consume train_large, CPU workers train_small (see docker-compose.yml)
+    profile = worker_profile(QUEUE_LARGE if torch.cuda.is_available() else QUEUE_SMALL)
+    for base_model in base_models:
+        try:
+            model, _ = checkout_base(
+                base_model, profile, config=load_config(base_model), **profile_load_kwargs(profile)
+            )
+            checkin_base(base_model, profile, model)
+            tokenizer_for(base_model)
+        except Exception as e:
+            print(f"[WARM] Preload of {base_model} failed -> {e}")
 
-    # ------- Load base model -------
-    model = AutoModelForCausalLM.from_pretrained(
-        base_model,
-        quantization_config=bnb_config,
-        device_map="auto"
-    )
 
-    model = prepare_model_for_kbit_training(model)
-
-    lora_config = LoraConfig(
-        r=8,
-        lora_alpha=16,
-        lora_dropout=0.05,
-        bias="none",
-        target_modules=get_lora_target_modules(base_model),
-        task_type="CAUSAL_LM"
-    )
-
-    model = get_peft_model(model, lora_config)
-    model.print_trainable_parameters()
-
-    # ------- Trainer settings -------
-    output_dir = f"/data/models/job_{job_id}"
-    os.makedirs(output_dir, exist_ok=True)
-
-    training_args = TrainingArguments(
-        output_dir=output_dir,
-        per_device_train_batch_size=1,
-        gradient_accumulation_steps=4,
-        learning_rate=2e-4,
-        num_train_epochs=epochs,
-        logging_steps=5,
-        save_strategy="no",
-        bf16=torch.cuda.is_available(),
-        fp16=not torch.cuda.is_available(),
-        optim="paged_adamw_32bit"
-    )
+# -------- Train on job ----------
+def train_on_job(job_id: int, dataset_id: int, base_model: str, epochs: int, data_mode: str = "packed",
+                 queue: str = QUEUE_LARGE):
 
-    trainer = Trainer(
-        model=model,
-        args=training_args,
-        train_dataset=dataset,
-        data_collator=DataCollatorForLanguageModeling(tokenizer, mlm=False)
-    )
+    with SessionLocal() as db:
+        dataset = db.get(models.Dataset, dataset_id)
 
-    trainer.train()
+    ds_path = dataset.path
+    print(f"[job {job_id}] Loading dataset from {ds_path}")
 
-    # ------- Save adapter -------
-    adapter_path = os.path.join(output_dir, "adapter")
-    model.save_pretrained(adapter_path)
+    # ------- Extract + normalize text (txt / jsonl / docx) into cached shards -------
+    # content_hash is None for legacy uploads; ingestion hashes the file then
+    corpus = ingest_dataset(ds_path, dataset.filename, dataset.content_hash)
+
+    # ------- Hardware profile: per queue, the same one the API fingerprinted with -------
+    profile = worker_profile(queue)
+    print(f"[job {job_id}] CUDA: {torch.cuda.is_available()} | Profile: {profile}")
+    if profile != queue_profile(queue):
+        # not what the submit-time fingerprint describes, so it must not be matched
+        # any more; trained_fingerprint (set below) covers the profile actually used
+        _update_job(job_id, train_profile=profile, fingerprint=None)
+    else:
+        _update_job(job_id, train_profile=profile)
+
+    # ------- Load tokenizer + config (metadata only, no weights) -------
+    tokenizer = tokenizer_for(base_model)
+    config = load_config(base_model)   # pad_token_id falls back to eos here
+
+    block_size = min(settings.TRAIN_BLOCK_SIZE, tokenizer.model_max_length)
+    batch_sampler = None
+    if data_mode == "bucketed":
+        # ------- Keep sample boundaries: length-grouped batches, padded per batch -------
+        dataset = SampleDataset(build_sample_cache(corpus.shards, tokenizer, block_size, corpus.content_hash))
+        batch_sampler = LengthGroupedBatchSampler(
+            dataset.lengths,
+            token_budget=max(settings.TRAIN_TOKENS_PER_BATCH, block_size),
+            max_batch_size=settings.TRAIN_MAX_BATCH_SIZE,
+        )
+        collator = pad_collate(tokenizer.pad_token_id)
+        efficiency = batch_sampler.efficiency
+        print(
+            f"[job {job_id}] {len(dataset)} samples in {len(batch_sampler)} length-grouped batches, "
+            f"padding efficiency {efficiency:.1%}"
+        )
+    else:
+        # ------- Tokenize + pack into fixed blocks (cached on disk, read via memmap) -------
+        dataset = PackedBlockDataset(build_token_blocks(corpus.shards, tokenizer, block_size, corpus.content_hash))
+        collator = default_data_collator
+        efficiency = 1.0    # packed blocks carry no padding
+        print(f"[job {job_id}] Packed {dataset.n_tokens} tokens into {len(dataset)} blocks of {dataset.block_size}")
+
+    _update_job(job_id, padding_efficiency=efficiency)
+
+    per_device_batch_size = TRAIN_HPARAMS["per_device_train_batch_size"]
+    grad_accum = TRAIN_HPARAMS["gradient_accumulation_steps"]
+    if batch_sampler is not None:
+        tokens_per_step = float(dataset.lengths.sum()) / len(batch_sampler) * grad_accum
+    else:
+        tokens_per_step = dataset.block_size * per_device_batch_size * grad_accum
 
-    # ZIP LoRA weights for download
-    zip_path = f"/data/models/job_{job_id}/adapter.zip"
-    with zipfile.ZipFile(zip_path, "w") as z:
-        for root, _, files in os.walk(adapter_path):
-            for f in files:
-                full = os.path.join(root, f)
-                rel = os.path.relpath(full, adapter_path)
-                z.write(full, rel)
+    # ------- Base model: resident copy from a previous job, or loaded once now -------
+    model, load_stats = checkout_base(
+        base_model, profile, config=config, **profile_load_kwargs(profile)
+    )
+    _update_job(
+        job_id, load_seconds=load_stats.seconds, load_rss_mb=load_stats.rss_delta_mb,
+        peak_rss_mb=load_stats.peak_rss_mb,
+        # the base revision is known for sure now that it is downloaded; the
+        # submit-time fingerprint stays as it was (scheduler.find_duplicate matches either)
+        trained_fingerprint=job_fingerprint(
+            corpus.meta["content_hash"], corpus.meta["format"], base_model, epochs, data_mode, profile
+        ),
+    )
 
-    print(f"[job {job_id}] ✅ Training completed. Adapter: {zip_path}")
-    return zip_path
+    try:
+        if TRAIN_PROFILES[profile]["quantize"]:
+            model = prepare_model_for_kbit_training(model)
+
+        lora_config = LoraConfig(**LORA, target_modules=get_lora_target_modules(base_model))
+
+        model = get_peft_model(model, lora_config)
+        model.print_trainable_parameters()
+
+        # ------- Trainer settings -------
+        output_dir = f"/data/models/job_{job_id}"
+        os.makedirs(output_dir, exist_ok=True)
+        # a retry or redelivery of this job picks up where the last checkpoint left off
+        last_checkpoint = get_last_checkpoint(output_dir)
+
+        training_args = TrainingArguments(
+            output_dir=output_dir,
+            **TRAIN_HPARAMS,   # batch size, accumulation, lr, seed (see job_spec)
+            **profile_training_args(profile),
+            num_train_epochs=epochs,
+            logging_steps=5,
+            # adapter weights + optimizer/scheduler/RNG state every N steps, oldest pruned
+            save_strategy="steps",
+            save_steps=settings.TRAIN_CHECKPOINT_STEPS,
+            save_total_limit=settings.TRAIN_CHECKPOINT_LIMIT,
+        )
+
+        trainer_kwargs = dict(
+            model=model,
+            args=training_args,
+            train_dataset=dataset,
+            data_collator=collator,
+            callbacks=[TelemetryCallback(job_id, tokens_per_step)]
+        )
+        if batch_sampler is not None:
+            trainer = BucketedTrainer(batch_sampler=batch_sampler, **trainer_kwargs)
+        else:
+            trainer = Trainer(**trainer_kwargs)
+
+        if last_checkpoint:
+            state = TrainerState.load_from_json(os.path.join(last_checkpoint, "trainer_state.json"))
+            print(f"[job {job_id}] Resuming from {last_checkpoint} (step {state.global_step})")
+            _update_job(job_id, resumed_from_step=state.global_step)
+            if batch_sampler is not None:
+                # replay the same per-epoch batch order the interrupted run used
+                batch_sampler.set_epoch(int(state.epoch))
+        trainer.train(resume_from_checkpoint=last_checkpoint)
+
+        # ------- Save adapter -------
+        adapter_path = os.path.join(output_dir, "adapter")
+        model.save_pretrained(adapter_path)
+        for name in os.listdir(output_dir):
+            if name.startswith("checkpoint-"):   # final adapter is saved; resume state is obsolete
+                shutil.rmtree(os.path.join(output_dir, name), ignore_errors=True)
+    finally:
+        # strip this job's LoRA so the next job gets a pristine base
+        checkin_base(base_model, profile, model)
+
+    # Content hash + zip layout for downloads; the zip is streamed from the adapter dir
+    meta = artifacts.manifest(adapter_path)
+    if settings.ADAPTER_STORE_ZIP:
+        adapter_path = artifacts.write_zip(adapter_path, os.path.join(output_dir, "adapter.zip"), meta)
+
+    print(f"[job {job_id}] ✅ Training completed. Adapter: {adapter_path} ({meta['adapter_hash'][:12]})")
+    return adapter_path, meta["adapter_hash"]
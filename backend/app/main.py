@@ -1,33 +1,53 @@
 # backend/app/main.py
+"""
+Control-plane API: datasets, jobs, downloads, scheduler and DB stats.
+
+Importing this module must not import torch / transformers / peft: every API
+replica would pay their import time and memory just to list jobs. Inference
+routes are mounted here only when SERVE_INFERENCE is on (their engine imports
+the ML stack lazily, on the first request); otherwise run them as a separate
+process from app.inference_app. app.bench.startup checks both.
+"""
 import os
-from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, status, APIRouter
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Form, Depends, HTTPException, status, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from uuid import uuid4
-from fastapi.responses import FileResponse
-
-from .lora_infer import generate_text
-from .download import router as download_router
-from .predict import router as predict_router
-from .tasks import enqueue_training_job
-from .routes import trained_models
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .routes import trained_models, uploads, job_events, artifacts, scheduler as scheduler_routes
+from .routes import model_cache as model_cache_routes
 from .models import Dataset, Job
 from .config import settings
-from .db import get_db, Base, engine, SessionLocal
-from . import models, schemas, tasks
+from .db import get_async_db, Base, engine, ensure_schema, pool_stats
+from . import models, schemas, dataset_store, form_stream, scheduler, listing
 from .models_available import AVAILABLE_MODELS   # ✅ NEW LINE
 
-Base.metadata.create_all(bind=engine)
+DATA_MODES = ("packed", "bucketed")
+
 
-# ensure directories
-os.makedirs(settings.DATA_DIR, exist_ok=True)
-os.makedirs(settings.MODEL_DIR, exist_ok=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema + directories on startup, not at import (scripts and tests import this module too)
+    await run_in_threadpool(Base.metadata.create_all, bind=engine)
+    await run_in_threadpool(ensure_schema)
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+    os.makedirs(settings.MODEL_DIR, exist_ok=True)
+    yield
 
-app = FastAPI(title=settings.APP_NAME)
-app.include_router(predict_router)
-app.include_router(download_router)
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
+app.include_router(artifacts.router)
 app.include_router(trained_models.router)
+app.include_router(uploads.router)
+app.include_router(scheduler_routes.router)
+app.include_router(job_events.router)
+app.include_router(model_cache_routes.router)
+if settings.SERVE_INFERENCE:
+    from .inference_app import include_inference_routes
+    include_inference_routes(app)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,75 +55,128 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Content-Range", "Content-Disposition"],
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @app.get("/models")  # ✅ NEW ENDPOINT
 def get_models():
     return {"models": AVAILABLE_MODELS}
 
 
-@app.post("/datasets/upload", response_model=schemas.DatasetOut)
-async def upload_dataset(
+@app.post(
+    "/datasets/upload",
+    response_model=schemas.DatasetOut,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["name", "file"],
+        "properties": {"name": {"type": "string"}, "file": {"type": "string", "format": "binary"}},
+    }}}}},
+)
+async def upload_dataset(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Form fields `name` and `file`. The body is parsed as it arrives and the file
+    streamed into the blob store, hashed on the way; it is never held in memory
+    or spooled to a temporary file first."""
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds {settings.MAX_UPLOAD_SIZE_MB} MB limit.",
+    )
+    # declared size: reject before reading anything (allowing for the form framing)
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + form_stream.MAX_FIELD_BYTES:
+        raise too_large
+
+    try:
+        fields, filename, content_hash, path = await form_stream.receive_file_form(request, "file", max_bytes)
+    except dataset_store.BlobTooLarge:
+        # chunked bodies have no Content-Length: stop reading at the limit
+        raise too_large
+    except form_stream.FormError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if not fields.get("name"):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Missing form field 'name'")
+
+    # identical bytes share one blob in the content-addressed store
+    ds = models.Dataset(name=fields["name"], filename=filename or content_hash, path=path, content_hash=content_hash)
+    db.add(ds)
+    await db.commit()
+    await db.refresh(ds)
+    return ds
+
+
+@app.post("/datasets/from_hash", response_model=schemas.DatasetOut)
+async def dataset_from_hash(
     name: str = Form(...),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    content_hash: str = Form(...),
+    filename: str = Form(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    contents = await file.read()
-    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
-    if len(contents) > max_bytes:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File exceeds {settings.MAX_UPLOAD_SIZE_MB} MB limit.",
+    """Register a dataset for bytes the server already has, without re-uploading them."""
+    content_hash = content_hash.lower()
+    if not dataset_store.is_sha256(content_hash) or not dataset_store.has_blob(content_hash):
+        raise HTTPException(status_code=404, detail="No stored dataset with that hash")
+
+    if filename is None:
+        prior = await db.scalar(
+            select(models.Dataset.filename)
+            .where(models.Dataset.content_hash == content_hash)
+            .order_by(models.Dataset.id.desc())
+            .limit(1)
         )
+        filename = prior or content_hash
 
-    uid = str(uuid4())
-    saved_name = f"{uid}_{file.filename}"
-    path = os.path.join(settings.DATA_DIR, saved_name)
-    with open(path, "wb") as f:
-        f.write(contents)
-
-    ds = models.Dataset(name=name, filename=saved_name, path=path)
+    ds = models.Dataset(
+        name=name, filename=filename, path=dataset_store.blob_path(content_hash),
+        content_hash=content_hash
+    )
     db.add(ds)
-    db.commit()
-    db.refresh(ds)
+    await db.commit()
+    await db.refresh(ds)
     return ds
 
 
 @app.post("/start_training/", response_model=schemas.JobOut)
-def start_training(
+async def start_training(
     dataset_id: int = Form(...),
     base_model: str = Form(...),
     epochs: int = Form(1),
-    db: Session = Depends(get_db),
+    data_mode: str = Form("packed"),
+    priority: int = Form(scheduler.DEFAULT_PRIORITY),
+    user_id: str = Form(None),
+    force: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    ds = db.query(models.Dataset).filter(models.Dataset.id == dataset_id).first()
+    if data_mode not in DATA_MODES:
+        raise HTTPException(status_code=400, detail=f"data_mode must be one of {DATA_MODES}")
+
+    ds = await db.get(models.Dataset, dataset_id)
     if not ds:
         raise HTTPException(status_code=404, detail="Dataset not found")
 
-    job = models.Job(dataset_id=dataset_id, base_model=base_model, status="queued", epochs=epochs)
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-
-    tasks.enqueue_training_job.delay(job.id)
-    return job
+    job = models.Job(
+        dataset_id=dataset_id, base_model=base_model, status="queued", epochs=epochs,
+        data_mode=data_mode, user_id=user_id
+    )
+    # picks train_small / train_large and a fair-share priority, then enqueues;
+    # an identical earlier job is reused instead unless force is set
+    return await scheduler.dispatch(db, job, priority, ds, reuse=not force)
 
 @app.post("/job/")
-def create_job(
+async def create_job(
     dataset_id: int = Form(...),
     base_model: str = Form(...),
     epochs: int = Form(...),
-    db: Session = Depends(get_db)
+    data_mode: str = Form("packed"),
+    priority: int = Form(scheduler.DEFAULT_PRIORITY),
+    user_id: str = Form(None),
+    force: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    if data_mode not in DATA_MODES:
+        return {"error": f"data_mode must be one of {DATA_MODES}"}
+
     # verify dataset exists
-    dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+    dataset = await db.get(Dataset, dataset_id)
     if not dataset:
         return {"error": "Dataset not found"}
 
@@ -112,60 +185,64 @@ def create_job(
         dataset_id=dataset_id,
         base_model=base_model,
         epochs=epochs,
+        data_mode=data_mode,
+        user_id=user_id,
         status="queued"
     )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
 
-    # enqueue background training task
-    enqueue_training_job.delay(job.id)
+    # enqueue background training task on the queue that fits the model
+    job = await scheduler.dispatch(db, job, priority, dataset, reuse=not force)
 
-    return {"job_id": job.id, "status": job.status}\
+    return {
+        "job_id": job.id, "status": job.status, "queue": job.queue, "priority": job.priority,
+        "reused_from_job_id": job.reused_from_job_id,
+    }\
     
+JOB_LIST_FIELDS = ("id", "base_model", "status", "adapter_path")
+JOB_FIELDS = set(schemas.JobOut.model_fields)
+
 @app.get("/jobs")
-def list_jobs(db: Session = Depends(get_db)):
-    jobs = db.query(models.Job).order_by(models.Job.id.desc()).all()
-    return [
-        {
-            "id": j.id,
-            "base_model": j.base_model,
-            "status": j.status,
-            "adapter_path": j.adapter_path
-        }
-        for j in jobs
-    ]
+async def list_jobs(
+    request: Request,
+    status: str = None,
+    base_model: str = None,
+    dataset_id: int = None,
+    fields: str = None,
+    cursor: str = None,
+    limit: int = listing.DEFAULT_LIMIT,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Newest jobs first. Next page: ?cursor=<X-Next-Cursor>. Honors If-None-Match."""
+    names = listing.parse_fields(fields, JOB_LIST_FIELDS, JOB_FIELDS)
+    stmt = select(*[getattr(models.Job, n) for n in names])
+    if status:
+        stmt = stmt.where(models.Job.status == status)
+    if base_model:
+        stmt = stmt.where(models.Job.base_model == base_model)
+    if dataset_id is not None:
+        stmt = stmt.where(models.Job.dataset_id == dataset_id)
+
+    rows, next_cursor = await listing.keyset_page(db, stmt, models.Job.id, cursor, limit)
+    return listing.list_response(request, rows, lambda r: dict(zip(names, r)), next_cursor)
 
 @app.get("/jobs/{job_id}", response_model=schemas.JobOut)
-def get_job(job_id: int, db: Session = Depends(get_db)):
-    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(models.Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
-@app.get("/download/adapter/{job_id}")
-def download_adapter(job_id: int, db: Session = Depends(get_db)):
-    job = db.query(models.Job).filter(models.Job.id == job_id).first()
-    if not job or not job.adapter_path:
-        raise HTTPException(404, "Adapter not ready")
-
-    path = job.adapter_path
-    if not os.path.exists(path):
-        raise HTTPException(404, "File missing")
-
-    return FileResponse(path, filename=f"adapter_job_{job_id}.zip")
-@app.post("/infer")
-def infer(
-    base_model: str = Form(...),
-    adapter_job_id: int = Form(...),
-    prompt: str = Form(...)
-):
-    try:
-        output = generate_text(base_model, adapter_job_id, prompt)
-        return {"response": output}
-
-    except Exception as e:
-        import traceback
-        print("[ERR] Inference failed:")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+@app.post("/jobs/{job_id}/resume", response_model=schemas.JobOut)
+async def resume_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Re-enqueue a failed job; training continues from its latest checkpoint if it has one."""
+    job = await db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "failed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; only failed jobs can be resumed")
+    return await scheduler.requeue(db, job)
+
+@app.get("/db/stats")
+def db_stats():
+    """Connection pool size / checked-out / overflow, plus connect and checkout counters."""
+    return pool_stats()
@@ -0,0 +1,387 @@
+# backend/app/model_cache.py
+"""
+Shared on-disk store of base models, prefetched ahead of jobs.
+
+Each model known to model_registry / models_available can be materialized
+into MODEL_STORE_DIR/<org--name>/ as a plain directory: config, tokenizer
+files and *.safetensors weights (memory-mapped on load). Repos that only
+publish pickled *.bin weights are converted once at prefetch time. A
+manifest.json records the source revision and per-file size / sha256, which
+verify() checks along with each safetensors header.
+
+model_loader resolves a model id to its store directory when it is present,
+so loads never touch the network. With MODEL_SOURCE_DIR set (a directory of
+model folders named like the hub id or <org--name>), prefetch copies from
+there instead of the Hub, and the whole flow works offline.
+
+The store is bounded by MODEL_STORE_QUOTA_GB: after a prefetch, the least
+recently loaded models are evicted until it fits.
+
+    python -m app.model_cache status
+    python -m app.model_cache prefetch distilgpt2 gpt2      (or --all)
+    python -m app.model_cache verify distilgpt2
+    python -m app.model_cache evict gpt2
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import struct
+import time
+import uuid
+
+from .config import settings
+from .model_registry import BASE_MODELS
+from .models_available import AVAILABLE_MODELS
+from .token_cache import file_sha256
+
+MANIFEST = "manifest.json"
+LAST_USED = ".last_used"   # mtime is bumped on every load
+GB = 1024 ** 3
+
+# everything a causal LM + tokenizer needs, minus the weights
+META_PATTERNS = ("*.json", "*.txt", "*.model", "*.tiktoken", "*.py")
+SAFETENSORS_PATTERNS = ("*.safetensors", "*.safetensors.index.json")
+PICKLE_PATTERNS = ("*.bin", "*.bin.index.json")
+
+
+class ModelNotAvailable(LookupError):
+    pass
+
+
+# -------- Names -------
+def hub_id(model: str) -> str:
+    """Registry short ids (e.g. "tiny-gpt2") map to their hub id; anything else is taken as-is."""
+    for entry in BASE_MODELS:
+        if model in (entry["id"], entry["hf_id"]):
+            return entry["hf_id"]
+    return model
+
+
+def known_models() -> list:
+    """Hub ids of every model the service offers, in registry order."""
+    ids = [e["hf_id"] for e in BASE_MODELS] + [m["id"] for m in AVAILABLE_MODELS]
+    return list(dict.fromkeys(ids))
+
+
+def store_dir(model: str) -> str:
+    return os.path.join(settings.MODEL_STORE_DIR, hub_id(model).replace("/", "--"))
+
+
+def read_manifest(model: str):
+    return _read_manifest(store_dir(model))
+
+
+def _read_manifest(path: str):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve(model: str) -> str:
+    """Local store directory for `model` if it has been prefetched, else `model` unchanged."""
+    if os.path.isdir(model):
+        return model
+    path = store_dir(model)
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        return model
+    try:
+        os.utime(os.path.join(path, LAST_USED))
+    except FileNotFoundError:
+        open(os.path.join(path, LAST_USED), "w").close()
+    except OSError:
+        pass   # read-only store: LRU order just stays as it was
+    return path
+
+
+# -------- Materialize -------
+def _matching(names, patterns):
+    return [n for n in names if any(fnmatch.fnmatch(os.path.basename(n), p) for p in patterns)]
+
+
+def _source_dir(model: str):
+    if not settings.MODEL_SOURCE_DIR:
+        return None
+    hf = hub_id(model)
+    for name in (hf, hf.replace("/", "--"), hf.rsplit("/", 1)[-1]):
+        path = os.path.join(settings.MODEL_SOURCE_DIR, name)
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def _copy_local(src: str, dest: str):
+    names = [
+        os.path.relpath(os.path.join(root, f), src)
+        for root, dirs, files in os.walk(src)
+        for f in files
+        if not any(part.startswith(".") for part in os.path.relpath(os.path.join(root, f), src).split(os.sep))
+    ]
+    weights = _matching(names, SAFETENSORS_PATTERNS) or _matching(names, PICKLE_PATTERNS)
+    if not weights:
+        raise ModelNotAvailable(f"No weights in {src}")
+    for name in sorted(set(_matching(names, META_PATTERNS) + weights)):
+        target = os.path.join(dest, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # a copy, not a hard link: conversion and save_pretrained write in place
+        shutil.copy2(os.path.join(src, name), target)
+
+
+def _download(model: str, dest: str) -> str:
+    from huggingface_hub import HfApi, snapshot_download
+
+    hf = hub_id(model)
+    token = settings.HF_TOKEN or None
+    info = HfApi().model_info(hf, token=token, files_metadata=False)
+    names = [s.rfilename for s in info.siblings or []]
+    weights = SAFETENSORS_PATTERNS if _matching(names, SAFETENSORS_PATTERNS) else PICKLE_PATTERNS
+    # pinned to one commit so metadata and weights come from the same snapshot
+    snapshot_download(
+        hf, revision=info.sha, local_dir=dest, token=token,
+        allow_patterns=list(META_PATTERNS + weights),
+    )
+    shutil.rmtree(os.path.join(dest, ".cache"), ignore_errors=True)   # hub download bookkeeping
+    return info.sha
+
+
+def _convert_to_safetensors(path: str):
+    """Rewrite pickled weights as safetensors (tied weights are handled by save_pretrained)."""
+    from transformers import AutoModelForCausalLM
+
+    model = AutoModelForCausalLM.from_pretrained(path, low_cpu_mem_usage=True)
+    model.save_pretrained(path, safe_serialization=True)
+    del model
+    for name in os.listdir(path):
+        if fnmatch.fnmatch(name, "*.bin") or fnmatch.fnmatch(name, "*.bin.index.json"):
+            os.remove(os.path.join(path, name))
+
+
+def _file_entries(path: str) -> list:
+    out = []
+    for root, _, files in os.walk(path):
+        for f in files:
+            rel = os.path.relpath(os.path.join(root, f), path)
+            if rel in (MANIFEST, LAST_USED):
+                continue
+            full = os.path.join(root, f)
+            out.append({"name": rel, "size": os.path.getsize(full), "sha256": file_sha256(full)})
+    return sorted(out, key=lambda e: e["name"])
+
+
+def prefetch(model: str, force: bool = False) -> dict:
+    """Materialize `model` in the store (from MODEL_SOURCE_DIR or the Hub), verify it, enforce the quota."""
+    manifest = read_manifest(model)
+    if manifest and not force:
+        resolve(model)
+        return manifest
+
+    dest = store_dir(model)
+    tmp = f"{dest}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp)
+    start = time.perf_counter()
+    try:
+        src = _source_dir(model)
+        revision = None
+        if src:
+            _copy_local(src, tmp)
+        elif settings.HF_HUB_OFFLINE:
+            raise ModelNotAvailable(f"{model} is not in MODEL_SOURCE_DIR and the Hub is offline")
+        else:
+            revision = _download(model, tmp)
+
+        names = os.listdir(tmp)
+        converted = not _matching(names, SAFETENSORS_PATTERNS)
+        if converted:
+            _convert_to_safetensors(tmp)
+
+        files = _file_entries(tmp)
+        manifest = {
+            "model": hub_id(model),
+            "source": src or "hub",
+            # local copies have no commit; name them by content so job fingerprints still track changes
+            "revision": revision or "local-" + hashlib.sha256(json.dumps(files).encode()).hexdigest()[:16],
+            "converted": converted,
+            "files": files,
+            "prefetched_at": time.time(),
+        }
+        manifest["bytes"] = sum(e["size"] for e in manifest["files"])
+        manifest["seconds"] = round(time.perf_counter() - start, 2)
+        problems = _check(tmp, manifest, hashes=False)
+        if problems:
+            raise ValueError(f"{model} failed verification: {problems}")
+        with open(os.path.join(tmp, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=1)
+        open(os.path.join(tmp, LAST_USED), "w").close()
+
+        if force:
+            shutil.rmtree(dest, ignore_errors=True)
+        try:
+            os.replace(tmp, dest)
+        except OSError:   # another process finished the same prefetch first
+            shutil.rmtree(tmp, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    print(f"[MODEL CACHE] {model}: {manifest['bytes'] / GB:.2f} GB in {manifest['seconds']}s "
+          f"from {manifest['source']}{' (converted)' if converted else ''}")
+    enforce_quota(protect=(hub_id(model),))
+    return read_manifest(model)
+
+
+def ensure(model: str):
+    """Prefetch before a job loads `model`; on failure the loader falls back to lazy hub loading."""
+    if os.path.isdir(model):
+        return None
+    try:
+        return prefetch(model)
+    except Exception as e:
+        print(f"[MODEL CACHE] Prefetch of {model} failed, loading lazily -> {e}")
+        return None
+
+
+# -------- Verify -------
+def _safetensors_problem(path: str):
+    """Header parses and every tensor lies inside the file."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        raw = f.read(8)
+        if len(raw) < 8:
+            return "truncated header"
+        (n,) = struct.unpack("<Q", raw)
+        if 8 + n > size:
+            return "header larger than file"
+        try:
+            header = json.loads(f.read(n))
+        except ValueError:
+            return "header is not JSON"
+    end = max((t["data_offsets"][1] for k, t in header.items() if k != "__metadata__"), default=0)
+    return None if 8 + n + end <= size else "tensor data past end of file"
+
+
+def _check(path: str, manifest: dict, hashes: bool = True) -> list:
+    problems = []
+    for e in manifest["files"]:
+        full = os.path.join(path, e["name"])
+        if not os.path.exists(full):
+            problems.append(f"{e['name']}: missing")
+        elif os.path.getsize(full) != e["size"]:
+            problems.append(f"{e['name']}: size changed")
+        elif hashes and file_sha256(full) != e["sha256"]:
+            problems.append(f"{e['name']}: sha256 mismatch")
+        elif e["name"].endswith(".safetensors"):
+            problem = _safetensors_problem(full)
+            if problem:
+                problems.append(f"{e['name']}: {problem}")
+    if not any(e["name"] == "config.json" for e in manifest["files"]):
+        problems.append("config.json: missing")
+    return problems
+
+
+def verify(model: str, hashes: bool = True) -> dict:
+    manifest = read_manifest(model)
+    if not manifest:
+        raise ModelNotAvailable(f"{model} is not in the model store")
+    problems = _check(store_dir(model), manifest, hashes=hashes)
+    return {"model": manifest["model"], "ok": not problems, "problems": problems}
+
+
+# -------- Status / eviction -------
+def _last_used(path: str) -> float:
+    try:
+        return os.path.getmtime(os.path.join(path, LAST_USED))
+    except OSError:
+        return 0.0
+
+
+def cached_models() -> list:
+    out = []
+    root = settings.MODEL_STORE_DIR
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        path = os.path.join(root, name)
+        manifest = _read_manifest(path)
+        if manifest is None or ".tmp-" in name:
+            continue
+        out.append({
+            "model": manifest["model"],
+            "bytes": manifest["bytes"],
+            "revision": manifest["revision"],
+            "source": manifest["source"],
+            "converted": manifest["converted"],
+            "prefetched_at": manifest["prefetched_at"],
+            "last_used": _last_used(path),
+        })
+    return out
+
+
+def status() -> dict:
+    cached = cached_models()
+    have = {m["model"] for m in cached}
+    used = sum(m["bytes"] for m in cached)
+    quota = settings.MODEL_STORE_QUOTA_GB * GB
+    return {
+        "store_dir": settings.MODEL_STORE_DIR,
+        "source_dir": settings.MODEL_SOURCE_DIR or None,
+        "bytes": used,
+        "quota_bytes": quota or None,
+        "cached": cached,
+        "missing": [m for m in known_models() if m not in have],
+    }
+
+
+def evict(model: str) -> bool:
+    path = store_dir(model)
+    if not os.path.isdir(path):
+        return False
+    # loaded models keep working: safetensors mmaps survive the unlink
+    shutil.rmtree(path, ignore_errors=True)
+    print(f"[MODEL CACHE] Evicted {hub_id(model)}")
+    return True
+
+
+def enforce_quota(protect=()) -> list:
+    """Evict least recently loaded models until the store fits MODEL_STORE_QUOTA_GB (0 = no limit)."""
+    quota = settings.MODEL_STORE_QUOTA_GB * GB
+    if not quota:
+        return []
+    cached = sorted(cached_models(), key=lambda m: m["last_used"])
+    used = sum(m["bytes"] for m in cached)
+    evicted = []
+    for m in cached:
+        if used <= quota:
+            break
+        if m["model"] in protect:
+            continue
+        evict(m["model"])
+        used -= m["bytes"]
+        evicted.append(m["model"])
+    return evicted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Base-model store: status, prefetch, verify, evict")
+    parser.add_argument("command", choices=("status", "prefetch", "verify", "evict"))
+    parser.add_argument("models", nargs="*")
+    parser.add_argument("--all", action="store_true", help="every model in the registry")
+    parser.add_argument("--force", action="store_true", help="prefetch again even if present")
+    args = parser.parse_args()
+
+    models = known_models() if args.all else args.models
+    if args.command == "status":
+        print(json.dumps(status(), indent=2))
+    for model in models:
+        if args.command == "prefetch":
+            try:
+                manifest = prefetch(model, force=args.force)
+                print(f"{model}: ok ({manifest['bytes'] / GB:.2f} GB)")
+            except Exception as e:
+                print(f"{model}: failed -> {e}")
+        elif args.command == "verify":
+            print(json.dumps(verify(model)))
+        elif args.command == "evict":
+            print(f"{model}: {'evicted' if evict(model) else 'not cached'}")
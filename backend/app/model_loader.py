@@ -0,0 +1,92 @@
+# backend/app/model_loader.py
+"""
+Single entry point for loading tokenizers, configs and model weights.
+
+Config and tokenizer metadata never instantiate weights, and weights are loaded
+exactly once per call to load_causal_lm, which also reports how long the load
+took and how much resident memory it added. Models prefetched into
+the shared store (model_cache) load from there; anything else goes through the
+HF cache as before.
+"""
+import resource
+import time
+
+from .config import settings
+from .model_cache import resolve
+
+
+def hf_kwargs() -> dict:
+    kwargs = {"cache_dir": settings.MODEL_CACHE_DIR}
+    if settings.HF_TOKEN:
+        kwargs["token"] = settings.HF_TOKEN
+    return kwargs
+
+
+def peak_rss_mb() -> float:
+    """Process-lifetime RSS high-water mark (ru_maxrss is KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    """Resident memory right now; the high-water mark where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+
+def load_tokenizer(base_model: str, padding_side: str = None):
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(resolve(base_model), **hf_kwargs())
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    if padding_side:
+        tokenizer.padding_side = padding_side
+    return tokenizer
+
+
+def load_config(base_model: str):
+    """Model config only (config.json) — no weights are read."""
+    from transformers import AutoConfig
+
+    config = AutoConfig.from_pretrained(resolve(base_model), **hf_kwargs())
+    if getattr(config, "pad_token_id", None) is None:
+        config.pad_token_id = config.eos_token_id
+    return config
+
+
+class LoadStats:
+    """seconds and rss_delta_mb belong to this load; peak_rss_mb is the process-lifetime maximum."""
+
+    def __init__(self, seconds: float, rss_delta_mb: float, peak_rss_mb: float):
+        self.seconds = seconds
+        self.rss_delta_mb = rss_delta_mb
+        self.peak_rss_mb = peak_rss_mb
+
+    def __repr__(self):
+        return (
+            f"LoadStats(seconds={self.seconds:.2f}, rss_delta_mb={self.rss_delta_mb:.0f}, "
+            f"peak_rss_mb={self.peak_rss_mb:.0f})"
+        )
+
+
+def load_causal_lm(base_model: str, config=None, **kwargs):
+    """Load model weights once. Returns (model, LoadStats)."""
+    from transformers import AutoModelForCausalLM
+
+    config = config or load_config(base_model)
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model = AutoModelForCausalLM.from_pretrained(
+        resolve(base_model),
+        config=config,
+        low_cpu_mem_usage=True,
+        **hf_kwargs(),
+        **kwargs
+    )
+    stats = LoadStats(time.perf_counter() - start, current_rss_mb() - rss_before, peak_rss_mb())
+    print(f"[LOAD] {base_model}: {stats}")
+    return model, stats
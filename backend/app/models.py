@@ -1,5 +1,5 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index
 from sqlalchemy.sql import func
 from .db import Base
 
@@ -10,16 +10,57 @@ class Dataset(Base):
     name = Column(String(256), nullable=False)
     filename = Column(String(512), nullable=False)
     path = Column(String(1024), nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the stored blob
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class Job(Base):
     __tablename__ = "jobs"
+    # status-filtered listings walk (status, id) in id order; it also serves status-only lookups
+    __table_args__ = (Index("ix_jobs_status_id", "status", "id"),)
     id = Column(Integer, primary_key=True, index=True)
-    dataset_id = Column(Integer, nullable=False)
+    dataset_id = Column(Integer, nullable=False, index=True)
     base_model = Column(String(256), nullable=False)
-    status = Column(String(50), nullable=False, default="queued")  # queued, running, completed, failed
+    status = Column(String(50), nullable=False, default="queued")  # queued, running, retrying, completed, failed
     adapter_path = Column(String(1024), nullable=True)
+    adapter_hash = Column(String(64), nullable=True)  # sha256 over the adapter files (artifacts.py)
     epochs = Column(Integer, default=1)
+    data_mode = Column(String(20), nullable=True, default="packed")  # packed, bucketed
+    padding_efficiency = Column(Float, nullable=True)  # real tokens / computed tokens
+    load_seconds = Column(Float, nullable=True)  # base-model weight load time
+    load_rss_mb = Column(Float, nullable=True)  # RSS added by this job's base load (0 on a warm hit)
+    peak_rss_mb = Column(Float, nullable=True)  # worker-lifetime RSS high-water mark, not per job
+    train_profile = Column(String(32), nullable=True)  # job_spec profile: qlora-nf4, cpu-bf16, cpu-fp32
+    user_id = Column(String(128), nullable=True, index=True)  # fair-share key
+    priority = Column(Integer, nullable=True)  # effective broker priority, 0-9
+    queue = Column(String(50), nullable=True, index=True)  # train_small, train_large
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    resumed_from_step = Column(Integer, nullable=True)  # checkpoint step of the latest resume
+    attempts = Column(Integer, nullable=True)  # deliveries started, incl. redeliveries after a lost worker
+    fingerprint = Column(String(64), nullable=True, index=True)  # job_spec.job_fingerprint at submit time
+    trained_fingerprint = Column(String(64), nullable=True, index=True)  # same, as resolved by the worker
+    reused_from_job_id = Column(Integer, nullable=True, index=True)  # job whose adapter this one shares
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    @property
+    def adapter_job_id(self) -> int:
+        """Job whose adapter files (and metrics) this job uses: itself unless it was deduplicated."""
+        return self.reused_from_job_id or self.id
+
+
+class JobMetric(Base):
+    """One row per training logging step (see telemetry.TelemetryCallback)."""
+    __tablename__ = "job_metrics"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, nullable=False, index=True)
+    step = Column(Integer, nullable=False)
+    max_steps = Column(Integer, nullable=True)
+    epoch = Column(Float, nullable=True)
+    loss = Column(Float, nullable=True)
+    learning_rate = Column(Float, nullable=True)
+    step_time_s = Column(Float, nullable=True)
+    tokens_per_sec = Column(Float, nullable=True)
+    eta_s = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,92 +1,73 @@
 # backend/app/predict.py
 import os
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
-from .db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import get_async_db
 from . import models
-from .config import settings
+from .inference_engine import engine, adapter_dir_for_job
+from .batching import batcher
+from .executor import inference_executor
+from .streaming import sse_generation
+from .quantize import PRECISIONS
 
 router = APIRouter()
 
-# Global model caches (RAM)
-LOADED_MODELS = {}        # base_model -> (tokenizer, model)
-LOADED_ADAPTERS = {}      # (base_model, job_id) -> adapter-applied model
 
 class PredictReq(BaseModel):
     job_id: int
     text: str
+    stream: bool = False
+    precision: Optional[str] = None   # fp32 | int8; default INFER_PRECISION
 
 
 @router.post("/predict/")
-async def predict(req: PredictReq):
-    db = SessionLocal()
-    try:
-        job = db.query(models.Job).filter(models.Job.id == req.job_id).first()
-        if not job:
-            raise HTTPException(status_code=404, detail="Job not found")
-
-        base_model = job.base_model
-        adapter_zip = job.adapter_path  # ✅ avoid undefined variable
-
-        import torch
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-
-        # ---- Load base model from cache or HF ----
-        if base_model not in LOADED_MODELS:
-            print(f"[PREDICT] Loading base model: {base_model}")
-            from transformers import AutoTokenizer, AutoModelForCausalLM
-
-            tokenizer = AutoTokenizer.from_pretrained(
-                base_model,
-                cache_dir=settings.MODEL_CACHE_DIR
-            )
-            model = AutoModelForCausalLM.from_pretrained(
-                base_model,
-                cache_dir=settings.MODEL_CACHE_DIR,
-                low_cpu_mem_usage=True
-            ).to(device)
-
-            LOADED_MODELS[base_model] = (tokenizer, model)
-        else:
-            tokenizer, model = LOADED_MODELS[base_model]
-
-        # ---- Load LoRA adapter if exists ----
-        key = (base_model, job.id)
-
-        if adapter_zip and os.path.exists(adapter_zip):
-            if key not in LOADED_ADAPTERS:
-                print(f"[PREDICT] Loading LoRA adapter for job {job.id} from {adapter_zip}")
-                try:
-                    import tempfile, zipfile, shutil
-                    from peft import PeftModel
-
-                    temp_dir = tempfile.mkdtemp()
-                    with zipfile.ZipFile(adapter_zip, "r") as z:
-                        z.extractall(temp_dir)
-
-                    lora_model = PeftModel.from_pretrained(model, temp_dir).to(device)
-                    LOADED_ADAPTERS[key] = lora_model
-
-                    shutil.rmtree(temp_dir)
-                except Exception as e:
-                    print(f"[PREDICT] Warning: failed to load LoRA adapter, using base model -> {e}")
-                    LOADED_ADAPTERS[key] = model
-
-            model = LOADED_ADAPTERS[key]
-        else:
-            print("[PREDICT] No adapter found — using base model")
-            model = LOADED_MODELS[base_model][1]
+async def predict(req: PredictReq, request: Request, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(models.Job, req.job_id)
+    # release the connection now; generation can take seconds
+    await db.close()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if req.precision not in (None, *PRECISIONS):
+        raise HTTPException(status_code=400, detail=f"precision must be one of {PRECISIONS}")
+    base_model = job.base_model
+
+    # ---- One resident base per base_model; adapters are switched per request ----
+    adapter_job_id = job.adapter_job_id if os.path.isdir(adapter_dir_for_job(job.adapter_job_id)) else None
+    if adapter_job_id is None:
+        print("[PREDICT] No adapter found — using base model")
+
+    gen_kwargs = dict(max_new_tokens=80, temperature=0.7, do_sample=True, precision=req.precision)
+
+    # ---- Streaming bypasses batching: tokens go out as they are produced ----
+    if req.stream:
+        inference_executor.admit()   # released by sse_generation however the stream ends
+        return sse_generation(
+            request,
+            lambda cancel: engine.stream_generate(
+                base_model, adapter_job_id, req.text, cancel=cancel,
+                spawn=inference_executor.execute, **gen_kwargs
+            ),
+            on_close=inference_executor.release,
+            timeout=inference_executor.timeout,
+            on_timeout=inference_executor.record_timeout,
+        )
 
-        # ---- Run inference ----
-        inputs = tokenizer(req.text, return_tensors="pt").to(device)
-        output = model.generate(
-            **inputs,
-            max_new_tokens=80,
-            temperature=0.7,
-            do_sample=True
+    # ---- Concurrent requests for the same base + adapter share one generate ----
+    try:
+        reply = await inference_executor.wait(
+            batcher.submit(base_model, adapter_job_id, req.text, **gen_kwargs)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        if adapter_job_id is None:
+            raise
+        print(f"[PREDICT] Warning: failed to load LoRA adapter, using base model -> {e}")
+        reply = await inference_executor.wait(
+            batcher.submit(base_model, None, req.text, **gen_kwargs)
         )
-        reply = tokenizer.decode(output[0], skip_special_tokens=True)
-        return {"input": req.text, "output": reply}
 
-    finally:
-        db.close()
+    return {"input": req.text, "output": reply}
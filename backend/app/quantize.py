@@ -0,0 +1,68 @@
+# backend/app/quantize.py
+"""
+Dynamic int8 quantization for CPU inference.
+
+Linear weights are stored as int8 (per-tensor scale) and activations are
+quantized on the fly per batch, so matmuls run through fbgemm / onednn int8
+kernels. There is nothing to calibrate, which is what makes it usable for any
+fine-tuned adapter without extra data. GPT-2 style models implement their
+projections as transformers' Conv1D (a transposed Linear), so those are
+rewritten as nn.Linear first or they would be left in fp32.
+
+Embeddings, lm_head (tied to the embedding in GPT-2, so quantizing it would
+add a copy instead of saving memory) and LoRA A/B matrices stay in fp32.
+"""
+import itertools
+
+PRECISIONS = ("fp32", "int8")
+SKIP_MODULES = ("lm_head", "lora_")
+
+
+def conv1d_to_linear(model):
+    """Replace every transformers Conv1D with an equivalent nn.Linear, in place."""
+    from torch import nn
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                linear = nn.Linear(child.nx, child.nf)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    return model
+
+
+def quantize_int8(model):
+    """Dynamic int8 copy of `model`'s Linear layers (CPU only). Works on plain and PEFT models."""
+    import torch
+    from torch import nn
+    from torch.ao.quantization import quantize_dynamic
+
+    model = conv1d_to_linear(model.eval())
+    targets = {
+        name for name, module in model.named_modules()
+        if isinstance(module, nn.Linear) and not any(s in name for s in SKIP_MODULES)
+    }
+    return quantize_dynamic(model, targets, dtype=torch.qint8, inplace=True)
+
+
+def _tensor_bytes(t) -> int:
+    return t.numel() * t.element_size()
+
+
+def model_bytes(model) -> int:
+    """Bytes held by the weights; unlike get_memory_footprint it counts packed int8 params.
+
+    Dynamic quantized Linears keep their weight in a packed blob that is neither
+    a parameter nor a buffer; it is counted through _weight_bias(), which
+    returns the quantized weight without copying it.
+    """
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    total = sum(_tensor_bytes(t) for t in itertools.chain(model.parameters(), model.buffers()))
+    for module in model.modules():
+        if isinstance(module, DynamicLinear):
+            weight, bias = module._weight_bias()
+            total += _tensor_bytes(weight) + (_tensor_bytes(bias) if bias is not None else 0)
+    return total
@@ -0,0 +1,151 @@
+# backend/app/resident_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResidentCache:
+    """LRU cache for heavy in-memory objects (models), bounded by entry count and bytes.
+
+    A limit of 0 disables that bound. Concurrent callers asking for the same missing
+    key wait for a single load instead of loading it twice.
+    """
+
+    def __init__(self, name: str, max_entries: int = 0, max_bytes: int = 0, on_evict=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        self._entries = OrderedDict()   # key -> [value, size_bytes]
+        self._key_locks = {}
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+        self.last_load_seconds = None
+
+    # ------- Lookups -------
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def peek(self, key):
+        """Like get(), but without touching LRU order."""
+        with self._lock:
+            item = self._entries.get(key)
+            return item[0] if item is not None else None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get_or_load(self, key, loader, sizer=None):
+        """Return the cached value for key, calling loader() once on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:  # loaded by a concurrent caller while we waited
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+
+            start = time.perf_counter()
+            value = loader()
+            elapsed = time.perf_counter() - start
+            size = sizer(value) if sizer else 0
+
+            with self._lock:
+                self.misses += 1
+                self.load_seconds_total += elapsed
+                self.last_load_seconds = elapsed
+                self._entries[key] = [value, size]
+                self._key_locks.pop(key, None)
+            self._evict(protect=key)
+            return value
+
+    # ------- Mutation -------
+    def put(self, key, value, size: int = 0):
+        with self._lock:
+            self._entries[key] = [value, size]
+            self._entries.move_to_end(key)
+        self._evict(protect=key)
+
+    def update_size(self, key, size: int):
+        with self._lock:
+            if key in self._entries:
+                self._entries[key][1] = size
+        self._evict(protect=key)
+
+    def pop(self, key, notify: bool = True):
+        with self._lock:
+            item = self._entries.pop(key, None)
+        if item is None:
+            return None
+        if notify and self.on_evict:
+            self.on_evict(key, item[0])
+        return item[0]
+
+    def clear(self):
+        for key in self.keys():
+            self.pop(key)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(size for _, size in self._entries.values())
+
+    def _over_budget(self) -> bool:
+        if self.max_entries and len(self._entries) > self.max_entries:
+            return True
+        if self.max_bytes and self.total_bytes() > self.max_bytes:
+            return True
+        return False
+
+    def _evict(self, protect=None):
+        evicted = []
+        with self._lock:
+            while self._over_budget():
+                victim = next((k for k in self._entries if k != protect), None)
+                if victim is None:
+                    break
+                evicted.append((victim, self._entries.pop(victim)[0]))
+                self.evictions += 1
+        for key, value in evicted:
+            print(f"[CACHE] {self.name}: evicted {key}")
+            if self.on_evict:
+                self.on_evict(key, value)
+
+    # ------- Metrics -------
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": [
+                    {"key": str(k), "bytes": size} for k, (_, size) in self._entries.items()
+                ],
+                "resident_bytes": self.total_bytes(),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_seconds_total": round(self.load_seconds_total, 3),
+                "last_load_seconds": (
+                    round(self.last_load_seconds, 3) if self.last_load_seconds is not None else None
+                ),
+            }
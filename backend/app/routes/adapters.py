@@ -0,0 +1,54 @@
+# backend/app/routes/adapters.py
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.db import get_async_db
+from app import models
+from app.inference_engine import engine
+
+router = APIRouter()
+
+
+async def _get_job(db: AsyncSession, job_id: int):
+    job = await db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/adapters")
+def adapter_stats():
+    """Resident adapters with hit/miss counters and resident bytes."""
+    return engine.stats()["adapters"]
+
+
+@router.post("/adapters/{job_id}/load")
+async def load_adapter(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Attach a job's LoRA adapter to its shared base model ahead of traffic."""
+    job = await _get_job(db, job_id)
+    await db.close()   # model loading is slow; don't hold a pooled connection through it
+    try:
+        return await run_in_threadpool(engine.load_adapter, job.base_model, job.adapter_job_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/adapters/{job_id}/merge")
+async def merge_adapter(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Serve a job's adapter from a merged copy of its base now, without waiting for it to get hot."""
+    job = await _get_job(db, job_id)
+    await db.close()
+    try:
+        return await run_in_threadpool(engine.merge, job.base_model, job.adapter_job_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/adapters/{job_id}")
+async def unload_adapter(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Drop a job's adapter (and its merged copy) from memory; the base model stays resident."""
+    job = await _get_job(db, job_id)
+    unloaded = engine.unload_adapter(job.base_model, job.adapter_job_id)
+    return {"job_id": job.id, "unloaded": unloaded}
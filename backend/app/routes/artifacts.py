@@ -0,0 +1,101 @@
+# backend/app/routes/artifacts.py
+"""
+Adapter downloads.
+
+    GET|HEAD /jobs/{id}/artifact                 deterministic adapter.zip, streamed
+    GET|HEAD /jobs/{id}/artifact?file=<name>     one raw file, e.g. adapter_model.safetensors
+    GET      /download/{id}, /download/adapter/{id}   aliases for the zip
+
+Responses carry a strong ETag derived from the adapter content hash, honor
+If-None-Match (304), Range / If-Range (206, 416) and can be cached by clients.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.db import get_async_db
+from app.listing import etag_matches
+from app import artifacts, models
+
+router = APIRouter()
+
+ARTIFACT_CACHE_CONTROL = "private, max-age=86400"
+
+
+async def _serve(request: Request, db: AsyncSession, job_id: int, file: str = None, filename: str = None):
+    job = await db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await db.close()
+
+    adapter_dir = artifacts.adapter_dir_for_job(job.adapter_job_id)
+    try:
+        meta = await run_in_threadpool(artifacts.manifest, adapter_dir)
+    except artifacts.ArtifactMissing:
+        raise HTTPException(status_code=404, detail="Adapter not ready or missing")
+
+    if file:
+        entry = next((e for e in meta["files"] if e["name"] == file), None)
+        if entry is None:
+            names = [e["name"] for e in meta["files"]]
+            raise HTTPException(status_code=404, detail=f"No file {file!r} in adapter; have {names}")
+        segments = [(None, (f"{adapter_dir}/{entry['name']}", entry["size"]))]
+        etag = f'"{entry["sha256"]}"'
+        media_type = "application/octet-stream"
+        filename = filename or entry["name"].rsplit("/", 1)[-1]
+    else:
+        try:
+            segments = artifacts.zip_segments(adapter_dir, meta)
+        except ValueError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        etag = f'"{meta["adapter_hash"]}-zip{artifacts.ZIP_LAYOUT_VERSION}"'
+        media_type = "application/zip"
+        filename = filename or f"adapter_job_{job.id}.zip"
+
+    size = artifacts.segments_size(segments)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": ARTIFACT_CACHE_CONTROL,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range == etag:   # a stale If-Range gets the whole, current body
+        try:
+            byte_range = artifacts.parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code, start, end = 200, 0, size - 1
+    if byte_range:
+        status_code, (start, end) = 206, byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        artifacts.iter_segments(segments, start, end),
+        status_code=status_code, headers=headers, media_type=media_type,
+    )
+
+
+@router.api_route("/jobs/{job_id}/artifact", methods=["GET", "HEAD"])
+async def job_artifact(job_id: int, request: Request, file: str = None, db: AsyncSession = Depends(get_async_db)):
+    """The trained adapter as a zip, or one of its files with ?file=<name>."""
+    return await _serve(request, db, job_id, file)
+
+
+@router.api_route("/download/{job_id}", methods=["GET", "HEAD"])
+async def download_adapter(job_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _serve(request, db, job_id, filename=f"job_{job_id}_adapter.zip")
+
+
+@router.api_route("/download/adapter/{job_id}", methods=["GET", "HEAD"])
+async def download_adapter_zip(job_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _serve(request, db, job_id, filename=f"adapter_job_{job_id}.zip")
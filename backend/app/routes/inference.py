@@ -0,0 +1,69 @@
+# backend/app/routes/inference.py
+from fastapi import APIRouter, Depends, Form, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_async_db
+from app.lora_infer import generate_text, stream_text
+from app.streaming import sse_generation
+from app.inference_engine import engine as infer_engine
+from app.batching import batcher
+from app.executor import inference_executor
+from app.quantize import PRECISIONS
+from app import models
+
+router = APIRouter()
+
+
+@router.get("/infer/stats")
+def infer_stats():
+    """Resident models, cache budget, cold-vs-warm loads, batching and queue metrics."""
+    return {
+        **infer_engine.stats(),
+        "batcher": batcher.stats(),
+        "executor": inference_executor.stats(),
+    }
+
+
+@router.post("/infer")
+async def infer(
+    request: Request,
+    base_model: str = Form(...),
+    adapter_job_id: int = Form(...),
+    prompt: str = Form(...),
+    stream: bool = Form(False),
+    precision: str = Form(None),   # fp32 | int8; default INFER_PRECISION
+    db: AsyncSession = Depends(get_async_db),
+):
+    # deduplicated jobs serve the adapter of the job that trained it
+    source = await db.scalar(select(models.Job.reused_from_job_id).where(models.Job.id == adapter_job_id))
+    adapter_job_id = source or adapter_job_id
+    await db.close()
+    if precision not in (None, *PRECISIONS):
+        raise HTTPException(status_code=400, detail=f"precision must be one of {PRECISIONS}")
+    try:
+        if stream:
+            # text/event-stream: {"token": ...} events, then a "done" event with TTFT and tokens/sec
+            inference_executor.admit()   # released by sse_generation however the stream ends
+            return sse_generation(
+                request,
+                lambda cancel: stream_text(
+                    base_model, adapter_job_id, prompt,
+                    cancel=cancel, spawn=inference_executor.execute, precision=precision
+                ),
+                on_close=inference_executor.release,
+                timeout=inference_executor.timeout,
+                on_timeout=inference_executor.record_timeout,
+            )
+
+        # model work runs on the bounded inference pool, not the event loop
+        output = await inference_executor.run(generate_text, base_model, adapter_job_id, prompt, precision)
+        return {"response": output}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print("[ERR] Inference failed:")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
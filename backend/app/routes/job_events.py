@@ -0,0 +1,117 @@
+# backend/app/routes/job_events.py
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import get_async_db, AsyncSessionLocal
+from app.streaming import SSE_HEADERS, sse_event
+from app import models
+
+router = APIRouter()
+
+TERMINAL_STATUSES = ("completed", "failed")
+KEEPALIVE_S = 15
+
+
+def metric_dict(m) -> dict:
+    return {
+        "id": m.id,
+        "step": m.step,
+        "max_steps": m.max_steps,
+        "epoch": m.epoch,
+        "loss": m.loss,
+        "learning_rate": m.learning_rate,
+        "step_time_s": m.step_time_s,
+        "tokens_per_sec": m.tokens_per_sec,
+        "eta_s": m.eta_s,
+        "created_at": m.created_at,
+    }
+
+
+def _job_status(job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "adapter_path": job.adapter_path,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def _metrics_after(db, job_id: int, after: int, limit: int = 500):
+    return (await db.scalars(
+        select(models.JobMetric)
+        .where(models.JobMetric.job_id == job_id, models.JobMetric.id > after)
+        .order_by(models.JobMetric.id)
+        .limit(limit)
+    )).all()
+
+
+async def _poll(job_id: int, after: int = None):
+    """(status dict or None, new metric dicts); metrics are skipped when after is None.
+
+    A short-lived session per poll, so an open stream never pins a pooled connection.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await db.get(models.Job, job_id)
+        if not job:
+            return None, []
+        # a deduplicated job streams the metrics of the job that is training for it
+        metrics = [] if after is None else [
+            metric_dict(m) for m in await _metrics_after(db, job.adapter_job_id, after)
+        ]
+        return _job_status(job), metrics
+
+
+@router.get("/jobs/{job_id}/metrics")
+async def job_metrics(job_id: int, after: int = 0, db: AsyncSession = Depends(get_async_db)):
+    """Recorded training metrics for a job, oldest first (page with ?after=<last id>)."""
+    job = await db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return [metric_dict(m) for m in await _metrics_after(db, job.adapter_job_id, after)]
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: int, request: Request, after: int = 0):
+    """Server-sent events: `status` on every status change, `metric` per logged step,
+    `done` once the job completes or fails. Reconnects resume via Last-Event-ID."""
+    last_id = request.headers.get("last-event-id")
+    after = int(last_id) if last_id and last_id.isdigit() else after
+
+    status, _ = await _poll(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        nonlocal after
+        last_status = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            status, metrics = await _poll(job_id, after)
+            if status is None:
+                break
+            for m in metrics:
+                after = m["id"]
+                yield sse_event(m, event="metric", id=after)
+            changed = status["status"] != last_status
+            if changed:
+                last_status = status["status"]
+                yield sse_event(status, event="status")
+            if last_status in TERMINAL_STATUSES and not metrics:
+                yield sse_event(status, event="done")
+                break
+
+            if metrics or changed:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > KEEPALIVE_S:
+                yield ": keepalive\n\n"   # SSE comment; keeps idle proxies from closing the stream
+                last_sent = time.monotonic()
+            await asyncio.sleep(settings.JOB_EVENTS_POLL_S)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,57 @@
+# backend/app/routes/model_cache.py
+"""
+Base-model store (see app.model_cache).
+
+    GET    /models/cache                      cached models, size, quota, what is missing
+    GET    /models/cache/{model}/verify       re-hash a cached model
+    POST   /models/cache/{model}/prefetch     queue a prefetch on a training worker
+    DELETE /models/cache/{model}              evict
+"""
+from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app import model_cache, scheduler
+from app.scheduler import MAX_PRIORITY
+
+router = APIRouter()
+
+
+def _known(model_id: str) -> str:
+    model = model_cache.hub_id(model_id)
+    if model not in model_cache.known_models():
+        raise HTTPException(status_code=404, detail=f"Unknown model {model_id!r}")
+    return model
+
+
+@router.get("/models/cache")
+async def cache_status():
+    return await run_in_threadpool(model_cache.status)
+
+
+@router.get("/models/cache/{model_id:path}/verify")
+async def verify_model(model_id: str):
+    try:
+        return await run_in_threadpool(model_cache.verify, _known(model_id))
+    except model_cache.ModelNotAvailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/models/cache/{model_id:path}/prefetch", status_code=202)
+async def prefetch_model(model_id: str, force: bool = False):
+    from app.tasks import prefetch_base_model
+
+    model = _known(model_id)
+    queue = scheduler.job_class(model)
+    # ahead of any training job waiting on the same queue
+    result = await run_in_threadpool(
+        prefetch_base_model.apply_async, args=[model, force], queue=queue, priority=MAX_PRIORITY
+    )
+    return {"model": model, "queue": queue, "task_id": result.id}
+
+
+@router.delete("/models/cache/{model_id:path}")
+async def evict_model(model_id: str):
+    model = _known(model_id)
+    if not await run_in_threadpool(model_cache.evict, model):
+        raise HTTPException(status_code=404, detail=f"{model} is not cached")
+    return {"model": model, "evicted": True}
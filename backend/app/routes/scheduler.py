@@ -0,0 +1,13 @@
+# backend/app/routes/scheduler.py
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_db
+from app import scheduler
+
+router = APIRouter()
+
+
+@router.get("/scheduler/stats")
+async def scheduler_stats(window: int = 200, db: AsyncSession = Depends(get_async_db)):
+    """Queue depth, queue-wait and run-time percentiles, and throughput per training queue."""
+    return await scheduler.queue_stats(db, window=max(1, min(window, 5000)))
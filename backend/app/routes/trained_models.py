@@ -1,24 +1,42 @@
 # backend/app/routes/trained_models.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.db import get_db
-from app import models
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_db
+from app import models, listing
 
 router = APIRouter()
 
 @router.get("/models/trained")
-def get_trained_models(db: Session = Depends(get_db)):
-    """Return list of completed fine-tuning jobs and their adapter paths."""
-    jobs = db.query(models.Job).filter(models.Job.status == "completed").all()
+async def get_trained_models(
+    request: Request,
+    base_model: str = None,
+    dataset_id: int = None,
+    cursor: str = None,
+    limit: int = listing.DEFAULT_LIMIT,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Return completed fine-tuning jobs and their adapter paths, newest first (keyset-paginated)."""
+    Job = models.Job
+    stmt = select(
+        Job.id, Job.base_model, Job.dataset_id, Job.adapter_path, Job.status, Job.created_at
+    ).where(Job.status == "completed")
+    if base_model:
+        stmt = stmt.where(Job.base_model == base_model)
+    if dataset_id is not None:
+        stmt = stmt.where(Job.dataset_id == dataset_id)
 
-    return [
-        {
-            "job_id": job.id,
-            "base_model": job.base_model,
-            "dataset_id": job.dataset_id,
-            "adapter_path": job.adapter_path or None,
-            "status": job.status,
-            "trained_at": getattr(job, "created_at", None),
-        }
-        for job in jobs
-    ]
+    rows, next_cursor = await listing.keyset_page(db, stmt, Job.id, cursor, limit)
+    return listing.list_response(
+        request,
+        rows,
+        lambda r: {
+            "job_id": r.id,
+            "base_model": r.base_model,
+            "dataset_id": r.dataset_id,
+            "adapter_path": r.adapter_path or None,
+            "status": r.status,
+            "trained_at": r.created_at,
+        },
+        next_cursor,
+    )
@@ -0,0 +1,195 @@
+# backend/app/routes/uploads.py
+"""
+Resumable chunked uploads for large datasets.
+
+    POST   /uploads                       start: filename + total size (+ optional sha256)
+    PUT    /uploads/{id}/parts/{index}    raw bytes of one part (any order, re-sendable)
+    GET    /uploads/{id}                  which parts are stored / still missing
+    POST   /uploads/{id}/complete         assemble, hash, store, create the Dataset
+    DELETE /uploads/{id}                  abort
+
+Upload state lives on disk (DATA_DIR/resumable/<id>/), so an interrupted client
+resumes by asking for the status and re-sending only the missing parts, even
+across API restarts.
+"""
+import json
+import math
+import os
+import shutil
+import uuid
+
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.db import get_async_db
+from app import models, schemas, dataset_store
+
+router = APIRouter()
+
+STAGING_ROOT = os.path.join(settings.DATA_DIR, "resumable")
+MB = 1024 * 1024
+
+
+def _upload_dir(upload_id: str) -> str:
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return os.path.join(STAGING_ROOT, upload_id)
+
+
+def _load_meta(upload_id: str) -> dict:
+    path = os.path.join(_upload_dir(upload_id), "meta.json")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    with open(path) as f:
+        return json.load(f)
+
+
+def _part_path(upload_id: str, index: int) -> str:
+    return os.path.join(_upload_dir(upload_id), f"part_{index:06d}")
+
+
+def _part_size(meta: dict, index: int) -> int:
+    if index == meta["n_parts"] - 1:
+        return meta["size"] - index * meta["chunk_size"]
+    return meta["chunk_size"]
+
+
+def _received(upload_id: str, meta: dict):
+    return [
+        i for i in range(meta["n_parts"])
+        if os.path.exists(_part_path(upload_id, i))
+    ]
+
+
+@router.post("/uploads")
+def init_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    sha256: str = Form(None),
+):
+    max_bytes = settings.MAX_RESUMABLE_UPLOAD_MB * MB
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="size must be positive")
+    if size > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds {settings.MAX_RESUMABLE_UPLOAD_MB} MB limit.",
+        )
+
+    if sha256:
+        sha256 = sha256.lower()
+        if not dataset_store.is_sha256(sha256):
+            raise HTTPException(status_code=400, detail="sha256 must be 64 hex characters")
+        if dataset_store.has_blob(sha256):
+            # nothing to send; register it with POST /datasets/from_hash instead
+            return {"upload_id": None, "exists": True, "content_hash": sha256}
+
+    chunk_size = settings.UPLOAD_CHUNK_MB * MB
+    meta = {
+        "upload_id": uuid.uuid4().hex,
+        "filename": os.path.basename(filename),
+        "size": size,
+        "sha256": sha256,
+        "chunk_size": chunk_size,
+        "n_parts": math.ceil(size / chunk_size),
+    }
+    upload_dir = os.path.join(STAGING_ROOT, meta["upload_id"])
+    os.makedirs(upload_dir)
+    with open(os.path.join(upload_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return {**meta, "exists": False}
+
+
+@router.put("/uploads/{upload_id}/parts/{index}")
+async def upload_part(upload_id: str, index: int, request: Request):
+    meta = await run_in_threadpool(_load_meta, upload_id)
+    if not 0 <= index < meta["n_parts"]:
+        raise HTTPException(status_code=400, detail=f"part index must be in [0, {meta['n_parts']})")
+
+    expected = _part_size(meta, index)
+    final = _part_path(upload_id, index)
+    tmp = f"{final}.{uuid.uuid4().hex[:8]}.tmp"
+    written = 0
+    try:
+        with open(tmp, "wb") as out:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > expected:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Part {index} must be {expected} bytes",
+                    )
+                await run_in_threadpool(out.write, chunk)
+        if written != expected:
+            raise HTTPException(
+                status_code=400, detail=f"Part {index} must be {expected} bytes, got {written}"
+            )
+        os.replace(tmp, final)   # a part only counts once it is complete
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return {"upload_id": upload_id, "part": index, "bytes": written}
+
+
+@router.get("/uploads/{upload_id}")
+def upload_status(upload_id: str):
+    meta = _load_meta(upload_id)
+    received = _received(upload_id, meta)
+    done = set(received)
+    return {
+        **meta,
+        "received": received,
+        "missing": [i for i in range(meta["n_parts"]) if i not in done],
+        "bytes_received": sum(_part_size(meta, i) for i in received),
+    }
+
+
+def _assemble(upload_id: str, meta: dict):
+    """Concatenate the parts into the store, hashing as we go. Returns (hash, path)."""
+    writer = dataset_store.BlobWriter()
+    try:
+        for i in range(meta["n_parts"]):
+            with open(_part_path(upload_id, i), "rb") as part:
+                for block in iter(lambda: part.read(MB), b""):
+                    writer.write(block)
+    except Exception:
+        writer.discard()
+        raise
+    return writer.commit()
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=schemas.DatasetOut)
+async def complete_upload(
+    upload_id: str,
+    name: str = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    meta = await run_in_threadpool(_load_meta, upload_id)
+    missing = meta["n_parts"] - len(await run_in_threadpool(_received, upload_id, meta))
+    if missing:
+        raise HTTPException(status_code=409, detail=f"{missing} parts still missing")
+
+    content_hash, path = await run_in_threadpool(_assemble, upload_id, meta)
+    if meta["sha256"] and content_hash != meta["sha256"]:
+        # the blob is content-addressed, so it stays valid; the client just sent other bytes
+        raise HTTPException(
+            status_code=422, detail=f"sha256 mismatch: expected {meta['sha256']}, got {content_hash}"
+        )
+
+    ds = models.Dataset(name=name, filename=meta["filename"], path=path, content_hash=content_hash)
+    db.add(ds)
+    await db.commit()
+    await db.refresh(ds)
+    shutil.rmtree(_upload_dir(upload_id), ignore_errors=True)
+    return ds
+
+
+@router.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str):
+    _load_meta(upload_id)
+    shutil.rmtree(_upload_dir(upload_id), ignore_errors=True)
+    return {"upload_id": upload_id, "aborted": True}
@@ -0,0 +1,259 @@
+# backend/app/scheduler.py
+"""
+Routes training jobs to queues by resource class.
+
+Small models (by the params / recommended hints in model_registry.BASE_MODELS)
+go to train_small, which is consumed by a CPU worker running several jobs at
+once, each pinned to its own share of the cores. Everything else goes to
+train_large (GPU worker, one job at a time). Both queues are RabbitMQ priority
+queues; a user's effective priority drops with each job they already have
+queued or running, so one user cannot starve the others.
+
+Before anything is enqueued, the job's fingerprint (job_spec.py) is matched
+against earlier jobs: a completed match is reused as-is, and an in-flight one
+gets the new job attached as a follower that mirrors its status (see
+tasks.sync_followers) instead of training the same thing twice. Two identical
+submissions that race past the lookup both train; nothing breaks.
+"""
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import func, or_, select
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .model_registry import BASE_MODELS
+from .artifacts import adapter_dir_for_job
+from .ingest import resolve_format
+from .job_spec import job_fingerprint, queue_profile
+from . import models
+
+QUEUE_SMALL = "train_small"
+QUEUE_LARGE = "train_large"
+TRAIN_QUEUES = (QUEUE_SMALL, QUEUE_LARGE)
+
+MAX_PRIORITY = 9
+DEFAULT_PRIORITY = 5
+ACTIVE_STATUSES = ("queued", "running", "retrying")
+# hints that mean a model trains fine without a GPU
+CPU_FRIENDLY = ("testing_only", "cpu_ok", "cpu_or_gpu", "gpu_or_fast_cpu")
+
+_UNITS = {"K": 1e3, "M": 1e6, "B": 1e9}
+
+
+def parse_params(value: str) -> float:
+    """'82M' -> 82e6, '1.5B' -> 1.5e9; 0 when unknown."""
+    value = (value or "").strip().upper()
+    try:
+        if value and value[-1] in _UNITS:
+            return float(value[:-1]) * _UNITS[value[-1]]
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def registry_entry(base_model: str):
+    for entry in BASE_MODELS:
+        if base_model in (entry["id"], entry["hf_id"]):
+            return entry
+    return None
+
+
+def job_class(base_model: str) -> str:
+    """Queue for a base model; unknown models are treated as large."""
+    entry = registry_entry(base_model)
+    if not entry:
+        return QUEUE_LARGE
+    params = parse_params(entry.get("params"))
+    small = (
+        0 < params <= settings.SMALL_MODEL_MAX_PARAMS_M * 1e6
+        and entry.get("recommended") in CPU_FRIENDLY
+    )
+    return QUEUE_SMALL if small else QUEUE_LARGE
+
+
+async def _count(db, *where) -> int:
+    return (await db.execute(select(func.count()).select_from(models.Job).where(*where))).scalar_one()
+
+
+async def effective_priority(db, requested: int, user_id: str = None) -> int:
+    """Requested priority minus one per job the user already has waiting or running."""
+    priority = max(0, min(MAX_PRIORITY, requested))
+    if user_id:
+        active = await _count(
+            db,
+            models.Job.user_id == user_id,
+            models.Job.status.in_(ACTIVE_STATUSES),
+        )
+        priority -= min(active, settings.FAIR_SHARE_MAX_PENALTY)
+    return max(0, priority)
+
+
+async def _enqueue(job):
+    from .tasks import enqueue_training_job
+
+    # publishing to the broker is blocking network I/O
+    await run_in_threadpool(
+        enqueue_training_job.apply_async, args=[job.id], queue=job.queue, priority=job.priority
+    )
+
+
+async def find_duplicate(db, fingerprint: str):
+    """Newest completed job with this fingerprint whose adapter is still on disk,
+    else the oldest one still in flight; followers are never returned.
+
+    Matches the submit-time fingerprint and the one the worker recorded: the
+    base revision is often only known to the API once a worker has fetched it.
+    """
+    Job = models.Job
+    candidates = (await db.scalars(
+        select(Job)
+        .where(
+            or_(Job.fingerprint == fingerprint, Job.trained_fingerprint == fingerprint),
+            Job.reused_from_job_id.is_(None),
+            Job.status.in_(("completed",) + ACTIVE_STATUSES),
+        )
+        .order_by(Job.id.desc())
+    )).all()
+    for job in candidates:
+        if job.status == "completed" and os.path.isdir(adapter_dir_for_job(job.id)):
+            return job
+    active = [j for j in candidates if j.status in ACTIVE_STATUSES]
+    return active[-1] if active else None
+
+
+def _follow(job, source):
+    job.reused_from_job_id = source.id
+    job.status = source.status
+    job.queue = source.queue
+    job.started_at = source.started_at
+    if source.status == "completed":
+        job.adapter_path = source.adapter_path
+        job.adapter_hash = source.adapter_hash
+        job.train_profile = source.train_profile
+        job.started_at = job.finished_at = utcnow()
+
+
+async def dispatch(db, job, requested_priority: int = DEFAULT_PRIORITY, dataset=None, reuse: bool = True):
+    """Pick queue + priority for a freshly created job, record them, and enqueue it.
+
+    With reuse, a job identical to a completed or in-flight one is attached to
+    it instead (job.reused_from_job_id) and nothing is enqueued.
+    """
+    # counted before this job is committed as queued, so it does not penalise itself
+    job.priority = await effective_priority(db, requested_priority, job.user_id)
+    job.queue = job_class(job.base_model)
+    content_hash = dataset.content_hash if dataset else None
+    if content_hash:
+        # reads the file's header for .docx uploads
+        data_format = await run_in_threadpool(resolve_format, dataset.path, dataset.filename)
+        job.fingerprint = job_fingerprint(
+            content_hash, data_format, job.base_model, job.epochs, job.data_mode, queue_profile(job.queue)
+        )
+
+    source = await find_duplicate(db, job.fingerprint) if reuse and job.fingerprint else None
+    if source:
+        _follow(job, source)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    if source:
+        print(f"[SCHED] job {job.id} reuses job {source.id} ({source.status})")
+    else:
+        await _enqueue(job)
+    return job
+
+
+async def requeue(db, job):
+    """Send an existing job back to its queue at its recorded priority."""
+    job.status = "queued"
+    job.reused_from_job_id = None   # a failed follower retrains on its own
+    job.queue = job.queue or job_class(job.base_model)
+    job.priority = DEFAULT_PRIORITY if job.priority is None else job.priority
+    job.attempts = 0   # a manual resume gets a fresh delivery budget (tasks.enqueue_training_job)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    await _enqueue(job)
+    return job
+
+
+# -------- Worker side -------
+def _pool_slot():
+    """Index of this prefork pool process (0..concurrency-1), if known."""
+    try:
+        from billiard.process import current_process
+        return current_process().index
+    except (ImportError, AttributeError):
+        return None
+
+
+def pin_threads(queue: str) -> int:
+    """Limit torch intra-op threads for this job; small-queue jobs also get their own cores."""
+    import torch
+
+    cores = os.cpu_count() or 1
+    if queue != QUEUE_SMALL:
+        torch.set_num_threads(cores)
+        return cores
+
+    threads = settings.TRAIN_THREADS_PER_JOB or max(1, cores // max(1, settings.WORKER_CONCURRENCY))
+    torch.set_num_threads(threads)
+
+    slot = _pool_slot()
+    if slot is not None and hasattr(os, "sched_setaffinity") and threads * (slot + 1) <= cores:
+        os.sched_setaffinity(0, range(threads * slot, threads * (slot + 1)))
+    return threads
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+
+def _summary(values) -> dict:
+    return {
+        "avg": round(sum(values) / len(values), 2) if values else None,
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+    }
+
+
+def _seconds(a, b):
+    if a is None or b is None:
+        return None
+    # sqlite hands back naive datetimes; compare everything as UTC
+    a = a if a.tzinfo else a.replace(tzinfo=timezone.utc)
+    b = b if b.tzinfo else b.replace(tzinfo=timezone.utc)
+    return (b - a).total_seconds()
+
+
+async def queue_stats(db, window: int = 200) -> dict:
+    """Per-queue depth plus queue-wait / run-time over the last `window` finished jobs."""
+    Job = models.Job
+    out = {}
+    for queue in TRAIN_QUEUES:
+        finished = (await db.execute(
+            select(Job.created_at, Job.started_at, Job.finished_at)
+            .where(Job.queue == queue, Job.finished_at.isnot(None))
+            .order_by(Job.finished_at.desc())
+            .limit(window)
+        )).all()
+        waits = [w for w in (_seconds(j.created_at, j.started_at) for j in finished) if w is not None]
+        runs = [r for r in (_seconds(j.started_at, j.finished_at) for j in finished) if r is not None]
+        span = _seconds(finished[-1].started_at, finished[0].finished_at) if finished else None
+        out[queue] = {
+            "queued": await _count(db, Job.queue == queue, Job.status == "queued"),
+            "running": await _count(db, Job.queue == queue, Job.status == "running"),
+            "finished": len(finished),
+            "queue_wait_s": _summary(waits),
+            "run_time_s": _summary(runs),
+            "jobs_per_hour": round(len(finished) * 3600 / span, 2) if span else None,
+        }
+    return out
@@ -14,6 +14,7 @@ class DatasetOut(BaseModel):
     name: str
     filename: str
     path: str
+    content_hash: Optional[str] = None
     uploaded_at: datetime
 
     class Config:
@@ -24,6 +25,9 @@ class JobCreate(BaseModel):
     dataset_id: int
     base_model: str
     epochs: Optional[int] = 1
+    data_mode: Optional[str] = "packed"
+    priority: Optional[int] = 5
+    user_id: Optional[str] = None
 
 
 class JobOut(BaseModel):
@@ -32,7 +36,24 @@ class JobOut(BaseModel):
     base_model: str
     status: str
     adapter_path: Optional[str]
+    adapter_hash: Optional[str] = None
     epochs: int
+    data_mode: Optional[str] = None
+    padding_efficiency: Optional[float] = None
+    load_seconds: Optional[float] = None
+    load_rss_mb: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+    train_profile: Optional[str] = None
+    user_id: Optional[str] = None
+    priority: Optional[int] = None
+    queue: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    resumed_from_step: Optional[int] = None
+    attempts: Optional[int] = None
+    fingerprint: Optional[str] = None
+    trained_fingerprint: Optional[str] = None
+    reused_from_job_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime]
 
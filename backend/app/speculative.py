@@ -0,0 +1,146 @@
+# backend/app/speculative.py
+"""
+Speculative (assisted) decoding: a small draft model proposes tokens, the
+served model checks a whole run of them in one forward pass.
+
+Greedy outputs are identical to plain decoding, since every token is still
+the target's argmax; sampled outputs keep the target's distribution. The win
+depends on how often the draft guesses right, so drafts are configured per
+model family and must share the target's tokenizer. transformers only
+supports it for batch size 1, so batched /predict calls decode as before.
+
+Acceptance is measured by counting forward passes: every target pass emits
+the accepted draft tokens plus one token of its own, and every draft pass
+proposes one token, so
+
+    accepted = new tokens - target passes,  acceptance = accepted / draft passes
+"""
+import contextlib
+import threading
+
+from .config import settings
+from .model_cache import hub_id
+
+# target -> draft. Same tokenizer (GPT-2 BPE); distilgpt2 is about 4x cheaper than gpt2-medium
+DRAFT_MODELS = {
+    "gpt2": "distilgpt2",
+    "gpt2-medium": "distilgpt2",
+}
+
+
+def draft_models() -> dict:
+    """DRAFT_MODELS plus INFER_DRAFT_MODELS overrides ("target=draft,..."; an empty draft disables)."""
+    drafts = dict(DRAFT_MODELS)
+    for pair in settings.INFER_DRAFT_MODELS.split(","):
+        if "=" in pair:
+            target, draft = (p.strip() for p in pair.split("=", 1))
+            drafts[hub_id(target)] = hub_id(draft) if draft else None
+    return {t: d for t, d in drafts.items() if d}
+
+
+def draft_for(base_model: str):
+    return draft_models().get(hub_id(base_model))
+
+
+def backbone(model):
+    """The transformer stack, run exactly once per forward pass (also under PEFT wrappers)."""
+    if hasattr(model, "get_base_model"):
+        model = model.get_base_model()
+    return model.base_model
+
+
+class ForwardCounter:
+    """Counts forward passes of a model while active (a context manager)."""
+
+    def __init__(self, model):
+        self.module = backbone(model)
+        self.calls = 0
+        self._handle = None
+
+    def _hook(self, module, args, output):
+        self.calls += 1
+
+    def __enter__(self):
+        self._handle = self.module.register_forward_hook(self._hook)
+        return self
+
+    def __exit__(self, *exc):
+        self._handle.remove()
+
+
+def acceptance(new_tokens: int, target_passes: int, draft_passes: int):
+    return round(max(new_tokens - target_passes, 0) / draft_passes, 3) if draft_passes else None
+
+
+class Speculation:
+    """One generate() call: extra kwargs to pass it and, afterwards, its counts."""
+
+    def __init__(self, draft=None):
+        self.draft = draft   # LoadedBase of the draft model, or None for plain decoding
+        self.generate_kwargs = {"assistant_model": draft.model} if draft else {}
+        self.new_tokens = 0  # set by the caller once generate() returns
+        self.target_passes = 0
+        self.draft_passes = 0
+
+    def summary(self):
+        if not self.draft:
+            return None
+        return {
+            "draft_model": self.draft.base_model,
+            "acceptance_rate": acceptance(self.new_tokens, self.target_passes, self.draft_passes),
+            "tokens_per_target_pass": (
+                round(self.new_tokens / self.target_passes, 2) if self.target_passes else None
+            ),
+        }
+
+
+@contextlib.contextmanager
+def speculate(model, draft, stats=None, target: str = None):
+    """Wrap a generate() on `model` with `draft` as its assistant (plain decoding when draft is None).
+
+    Holds the draft's lock throughout: assisted generation tunes the draft's
+    generation_config as it goes, so one caller at a time.
+    """
+    spec = Speculation(draft)
+    if draft is None:
+        yield spec
+        return
+    with draft.lock, ForwardCounter(model) as target_passes, ForwardCounter(draft.model) as draft_passes:
+        yield spec
+    spec.target_passes, spec.draft_passes = target_passes.calls, draft_passes.calls
+    if stats is not None:
+        stats.record(target, spec)
+
+
+class SpeculationStats:
+    """Running acceptance and tokens-per-target-pass totals, per target model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}   # target -> {draft, requests, new_tokens, target_passes, draft_passes}
+
+    def record(self, target: str, spec: Speculation):
+        with self._lock:
+            t = self._totals.setdefault(
+                target,
+                {"draft": None, "requests": 0, "new_tokens": 0, "target_passes": 0, "draft_passes": 0},
+            )
+            t["draft"] = spec.draft.base_model
+            t["requests"] += 1
+            t["new_tokens"] += spec.new_tokens
+            t["target_passes"] += spec.target_passes
+            t["draft_passes"] += spec.draft_passes
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for target, t in self._totals.items():
+                out[target] = {
+                    **t,
+                    "acceptance_rate": acceptance(t["new_tokens"], t["target_passes"], t["draft_passes"]),
+                    # plain decoding is 1.0; roughly the upper bound on speedup
+                    "tokens_per_target_pass": (
+                        round(t["new_tokens"] / t["target_passes"], 2) if t["target_passes"] else None
+                    ),
+                }
+            return out
@@ -0,0 +1,109 @@
+# backend/app/streaming.py
+import asyncio
+import json
+import threading
+import time
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data: dict, event: str = None, id=None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    if id is not None:   # lets EventSource resume with Last-Event-ID after a reconnect
+        prefix += f"id: {id}\n"
+    return f"{prefix}data: {json.dumps(data, default=str)}\n\n"
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs its cleanup even if the body is never iterated."""
+
+    def __init__(self, content, close, **kwargs):
+        super().__init__(content, **kwargs)
+        self._close = close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._close()
+
+
+def _pump(stream, loop, queue: asyncio.Queue, cancel: threading.Event):
+    """Drain a blocking iterator on this thread, handing (event, error) pairs to the loop.
+
+    (None, None) marks the end.
+    """
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:   # the loop is gone, nobody is listening any more
+            cancel.set()
+
+    try:
+        for event in stream:
+            put((event, None))
+    except Exception as e:
+        put((None, e))
+        return
+    put((None, None))
+
+
+def sse_generation(request: Request, start_stream, on_close=None, timeout: float = None,
+                   on_timeout=None) -> StreamingResponse:
+    """Serve a blocking token generator as server-sent events.
+
+    start_stream(cancel) must return an iterator of event dicts. The iterator is
+    drained on a thread of its own, not Starlette's shared threadpool: a stream
+    blocks it for the whole generation, and admitted streams alone would
+    otherwise starve every sync endpoint. `cancel` is set as soon as the client
+    goes away so the model is released early. on_close() runs exactly once when
+    the response ends, however it ends (also when the client left before the
+    body started). With `timeout`, a stream still running after that many seconds
+    gets an error event and is cancelled; on_timeout() is called then.
+    """
+    cancel = threading.Event()
+    closed = threading.Lock()
+
+    def close():
+        cancel.set()
+        if on_close and closed.acquire(blocking=False):
+            on_close()
+
+    try:
+        stream = start_stream(cancel)
+    except Exception:
+        close()
+        raise
+    deadline = time.monotonic() + timeout if timeout else None
+
+    async def events():
+        queue = asyncio.Queue()
+        threading.Thread(
+            target=_pump, args=(stream, asyncio.get_running_loop(), queue, cancel), daemon=True
+        ).start()
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                remaining = deadline - time.monotonic() if deadline else None
+                try:
+                    event, error = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    cancel.set()
+                    if on_timeout:
+                        on_timeout()
+                    yield sse_event({"error": f"Generation did not finish within {timeout:g}s"}, event="error")
+                    break
+                if error is not None:
+                    yield sse_event({"error": str(error)}, event="error")
+                    break
+                if event is None:
+                    break
+                yield sse_event(event, event="done" if event.get("done") else None)
+        finally:
+            close()
+
+    return _ClosingStreamingResponse(events(), close, media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,11 +1,62 @@
 # backend/app/tasks.py
 from celery import Celery
+from celery.signals import worker_process_init
+from kombu import Queue
 from .config import settings
 from .db import SessionLocal
-from . import models
+from .scheduler import TRAIN_QUEUES, QUEUE_LARGE, MAX_PRIORITY, pin_threads, utcnow
+from . import models, model_cache
 import traceback
 
 celery_app = Celery("ftaas", broker=settings.BROKER_URL, backend=settings.RESULT_BACKEND)
+celery_app.conf.task_queues = [
+    Queue(name, queue_arguments={"x-max-priority": MAX_PRIORITY + 1}) for name in TRAIN_QUEUES
+]
+celery_app.conf.task_default_queue = QUEUE_LARGE
+# take one job at a time so broker priorities decide what runs next
+celery_app.conf.worker_prefetch_multiplier = 1
+celery_app.conf.task_acks_late = True
+# a job whose worker died is redelivered and resumes from its last checkpoint
+celery_app.conf.task_reject_on_worker_lost = True
+# preloading base models can take a while before the pool process reports ready
+celery_app.conf.worker_proc_alive_timeout = 300
+
+
+@worker_process_init.connect
+def configure_torch_threads(**_):
+    # has to happen before the first parallel op in this process; intra-op threads are per job
+    import torch
+    try:
+        torch.set_num_interop_threads(settings.TRAIN_INTEROP_THREADS)
+    except RuntimeError as e:
+        print(f"[WORKER] Could not set inter-op threads -> {e}")
+
+
+@worker_process_init.connect
+def preload_training_bases(**_):
+    names = [m.strip() for m in settings.WORKER_PRELOAD_MODELS.split(",") if m.strip()]
+    if names:
+        from .lora_train import preload_bases
+        preload_bases(names)
+
+
+@celery_app.task
+def prefetch_base_model(model: str, force: bool = False):
+    """Materialize a base model in the shared store ahead of the jobs that need it."""
+    manifest = model_cache.prefetch(model, force=force)
+    return {"model": manifest["model"], "bytes": manifest["bytes"], "revision": manifest["revision"]}
+
+
+FOLLOWED_FIELDS = ("status", "started_at", "finished_at", "adapter_path", "adapter_hash", "train_profile")
+
+
+def sync_followers(db, job):
+    """Mirror a training job's state onto duplicate jobs attached to it (see scheduler.dispatch)."""
+    db.query(models.Job).filter(
+        models.Job.reused_from_job_id == job.id,
+        models.Job.status.notin_(("completed", "failed")),
+    ).update({f: getattr(job, f) for f in FOLLOWED_FIELDS}, synchronize_session=False)
+    db.commit()
 
 
 @celery_app.task(bind=True)
@@ -16,33 +67,70 @@ def enqueue_training_job(self, job_id: int):
         if not job:
             return {"error": "job not found"}
 
+        # counted here, not via self.request.retries: a worker killed mid-job (OOM,
+        # segfault) gets the message redelivered without ever reaching self.retry()
+        job.attempts = (job.attempts or 0) + 1
+        if job.attempts > settings.TRAIN_MAX_RETRIES + 1:
+            job.status = "failed"
+            job.finished_at = utcnow()
+            db.add(job)
+            db.commit()
+            sync_followers(db, job)
+            print(f"[job {job.id}] giving up after {job.attempts - 1} attempts")
+            return {"error": "too many attempts"}
+
         # update job status to running
         job.status = "running"
+        job.started_at = utcnow()
+        job.finished_at = None
         db.add(job)
         db.commit()
         db.refresh(job)
+        sync_followers(db, job)
+
+        # weights come from the shared store as safetensors; a failed prefetch just loads lazily
+        model_cache.ensure(job.base_model)
+
+        threads = pin_threads(job.queue or QUEUE_LARGE)
+        print(f"[job {job.id}] queue={job.queue} priority={job.priority} torch_threads={threads}")
 
         # Import training logic (worker will run this)
         from .lora_train import train_on_job
 
-        adapter_path = train_on_job(job_id=job.id, dataset_id=job.dataset_id, base_model=job.base_model, epochs=job.epochs)
+        adapter_path, adapter_hash = train_on_job(
+            job_id=job.id,
+            dataset_id=job.dataset_id,
+            base_model=job.base_model,
+            epochs=job.epochs,
+            data_mode=job.data_mode or "packed",
+            queue=job.queue or QUEUE_LARGE,
+        )
 
         job.adapter_path = adapter_path
+        job.adapter_hash = adapter_hash
         job.status = "completed"
+        job.finished_at = utcnow()
         db.add(job)
         db.commit()
+        sync_followers(db, job)
         return {"status": "ok", "adapter_path": adapter_path}
     except Exception as exc:
-        # mark failed
+        # retry from the last checkpoint, or mark failed once attempts are used up
+        will_retry = self.request.retries < settings.TRAIN_MAX_RETRIES
         try:
             job = db.query(models.Job).filter(models.Job.id == job_id).first()
             if job:
-                job.status = "failed"
+                will_retry = (job.attempts or 0) <= settings.TRAIN_MAX_RETRIES
+                job.status = "retrying" if will_retry else "failed"
+                job.finished_at = None if will_retry else utcnow()
                 db.add(job)
                 db.commit()
+                sync_followers(db, job)
         except Exception:
             pass
         traceback.print_exc()
-        raise self.retry(exc=exc, countdown=10, max_retries=1)
+        if not will_retry:
+            raise
+        raise self.retry(exc=exc, countdown=10, max_retries=None)
     finally:
         db.close()
@@ -0,0 +1,62 @@
+# backend/app/telemetry.py
+"""
+Per-step training telemetry.
+
+TelemetryCallback records loss, learning rate, step time, tokens/sec and ETA
+into the job_metrics table at every logging step; /jobs/{id}/events streams
+those rows (and status changes) to clients as server-sent events.
+"""
+import time
+
+from transformers import TrainerCallback
+
+from .db import SessionLocal
+from . import models
+
+
+class TelemetryCallback(TrainerCallback):
+    """tokens_per_step: real (non-padding) tokens in one optimizer step, on average."""
+
+    def __init__(self, job_id: int, tokens_per_step: float):
+        self.job_id = job_id
+        self.tokens_per_step = tokens_per_step
+        self._mark_time = None
+        self._mark_step = 0
+        self._step_time = None   # smoothed seconds per optimizer step
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._mark_time = time.perf_counter()
+        self._mark_step = state.global_step   # non-zero when resuming from a checkpoint
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if not logs or "loss" not in logs:
+            return
+        now = time.perf_counter()
+        steps = state.global_step - self._mark_step
+        if steps <= 0:
+            return
+        elapsed = now - self._mark_time
+        step_time = elapsed / steps
+        self._step_time = step_time if self._step_time is None else 0.7 * self._step_time + 0.3 * step_time
+        self._mark_time, self._mark_step = now, state.global_step
+
+        metric = models.JobMetric(
+            job_id=self.job_id,
+            step=state.global_step,
+            max_steps=state.max_steps,
+            epoch=state.epoch,
+            loss=logs["loss"],
+            learning_rate=logs.get("learning_rate"),
+            step_time_s=step_time,
+            tokens_per_sec=self.tokens_per_step * steps / elapsed if elapsed > 0 else None,
+            eta_s=max(0, state.max_steps - state.global_step) * self._step_time,
+        )
+        db = SessionLocal()
+        try:
+            db.add(metric)
+            db.commit()
+        except Exception as e:   # telemetry must never fail a training run
+            db.rollback()
+            print(f"[job {self.job_id}] Could not record metrics -> {e}")
+        finally:
+            db.close()
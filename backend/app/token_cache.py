@@ -0,0 +1,236 @@
+# backend/app/token_cache.py
+"""
+Streaming tokenization + token-block packing for training datasets.
+
+The corpus is decoded and tokenized chunk by chunk and written as one flat array
+of token ids on disk. Training reads fixed-length blocks straight out of that
+file through np.memmap, so neither the raw text nor the token list is ever held
+in RAM, and nothing is padded. Results are cached under
+TOKEN_CACHE_DIR/<key>/ where key = (content hash, tokenizer, block size).
+
+build_sample_cache keeps sample boundaries instead (see bucketing.py).
+Both accept a single file or the ordered text shards produced by ingest.py.
+"""
+import codecs
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from .config import settings
+
+READ_CHUNK_BYTES = 1 << 20
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+
+# -------- Hashing -------
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    ident = json.dumps(
+        [type(tokenizer).__name__, tokenizer.name_or_path, len(tokenizer), tokenizer.eos_token_id]
+    )
+    return hashlib.sha256(ident.encode()).hexdigest()[:16]
+
+
+def cache_key(content_hash: str, tokenizer, block_size: int) -> str:
+    return f"{content_hash[:32]}-{tokenizer_fingerprint(tokenizer)}-b{block_size}"
+
+
+# -------- Streaming decode -------
+def detect_encoding(path: str) -> str:
+    with open(path, "rb") as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 4:   # sample cut a multi-byte char in half
+            return "utf-8"
+    import chardet
+    return chardet.detect(sample)["encoding"] or "utf-8"
+
+
+def iter_text_chunks(path: str):
+    """Yield decoded text in ~1 MB pieces, split before whitespace so words stay whole."""
+    decoder = codecs.getincrementaldecoder(detect_encoding(path))(errors="ignore")
+    carry = ""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            text = carry + decoder.decode(block)
+            cut = max(text.rfind("\n"), text.rfind(" "))
+            if cut <= 0:
+                carry = text
+                continue
+            yield text[:cut]
+            carry = text[cut:]
+    carry += decoder.decode(b"", final=True)
+    if carry:
+        yield carry
+
+
+# -------- Packed block cache -------
+def _token_dtype(tokenizer):
+    return np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max else np.uint32
+
+
+def _build_cache(cache_dir: str, write) -> str:
+    """Run write(tmp_dir) -> meta dict into a temp dir, then publish it atomically."""
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        print(f"[DATA] Token cache hit: {cache_dir}")
+        return cache_dir
+
+    tmp_dir = f"{cache_dir}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        meta = write(tmp_dir)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        try:
+            os.replace(tmp_dir, cache_dir)
+        except OSError:
+            # a concurrent build finished first; theirs is identical
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    print(f"[DATA] Cached {meta['n_tokens']} tokens in {cache_dir}")
+    return cache_dir
+
+
+def _as_paths(paths):
+    return [paths] if isinstance(paths, str) else list(paths)
+
+
+def build_token_blocks(paths, tokenizer, block_size: int, content_hash: str = None) -> str:
+    """Tokenize `paths` into the cache (once) and return the cache directory.
+
+    content_hash is required when more than one file is given.
+    """
+    paths = _as_paths(paths)
+    content_hash = content_hash or file_sha256(paths[0])
+    cache_dir = os.path.join(settings.TOKEN_CACHE_DIR, cache_key(content_hash, tokenizer, block_size))
+    dtype = _token_dtype(tokenizer)
+
+    def write(tmp_dir):
+        print(f"[DATA] Tokenizing {len(paths)} file(s) into packed blocks")
+        n_tokens = 0
+        with open(os.path.join(tmp_dir, "tokens.bin"), "wb") as out:
+            for chunk in (c for path in paths for c in iter_text_chunks(path)):
+                ids = tokenizer(chunk, add_special_tokens=False)["input_ids"]
+                np.asarray(ids, dtype=dtype).tofile(out)
+                n_tokens += len(ids)
+            if tokenizer.eos_token_id is not None:
+                np.asarray([tokenizer.eos_token_id], dtype=dtype).tofile(out)
+                n_tokens += 1
+        return {
+            "content_hash": content_hash,
+            "tokenizer": tokenizer.name_or_path,
+            "dtype": np.dtype(dtype).name,
+            "n_tokens": n_tokens,
+            "block_size": block_size,
+        }
+
+    return _build_cache(cache_dir, write)
+
+
+def iter_samples(paths):
+    """Yield sample texts: blank-line separated documents, or lines if the corpus has none.
+
+    The separator is decided once, from the start of the first file.
+    """
+    sep = None
+    carry = ""
+    for chunk in (c for path in _as_paths(paths) for c in iter_text_chunks(path)):
+        text = (carry + chunk).replace("\r\n", "\n")
+        if sep is None:
+            sep = "\n\n" if "\n\n" in text else "\n"
+        parts = text.split(sep)
+        carry = parts.pop()
+        for part in parts:
+            if part.strip():
+                yield part.strip()
+    if carry.strip():
+        yield carry.strip()
+
+
+def build_sample_cache(paths, tokenizer, max_length: int, content_hash: str = None) -> str:
+    """Tokenize `paths` as individual samples (each capped at max_length tokens).
+
+    Samples longer than max_length are split into several samples rather than
+    truncated. Stored as one flat token file plus an offsets index.
+    """
+    paths = _as_paths(paths)
+    content_hash = content_hash or file_sha256(paths[0])
+    key = cache_key(content_hash, tokenizer, max_length) + "-samples"
+    cache_dir = os.path.join(settings.TOKEN_CACHE_DIR, key)
+    dtype = _token_dtype(tokenizer)
+    eos = tokenizer.eos_token_id
+
+    def write(tmp_dir):
+        print(f"[DATA] Tokenizing {len(paths)} file(s) into samples")
+        lengths = []
+        with open(os.path.join(tmp_dir, "tokens.bin"), "wb") as out:
+            for text in iter_samples(paths):
+                ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+                if eos is not None:
+                    ids.append(eos)
+                for start in range(0, len(ids), max_length):
+                    piece = ids[start:start + max_length]
+                    np.asarray(piece, dtype=dtype).tofile(out)
+                    lengths.append(len(piece))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+        return {
+            "content_hash": content_hash,
+            "tokenizer": tokenizer.name_or_path,
+            "dtype": np.dtype(dtype).name,
+            "n_tokens": int(offsets[-1]),
+            "n_samples": len(lengths),
+            "max_length": max_length,
+        }
+
+    return _build_cache(cache_dir, write)
+
+
+class PackedBlockDataset:
+    """Fixed-length causal-LM blocks read from a token cache via np.memmap (map-style)."""
+
+    def __init__(self, cache_dir: str):
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.path = os.path.join(cache_dir, "tokens.bin")
+        self.dtype = np.dtype(meta["dtype"])
+        self.n_tokens = meta["n_tokens"]
+        if self.n_tokens == 0:
+            raise ValueError("Dataset is empty after tokenization")
+
+        # The ragged tail is dropped; a corpus shorter than one block becomes one short block
+        self.block_size = min(meta["block_size"], self.n_tokens)
+        self.n_blocks = self.n_tokens // self.block_size
+        self._tokens = None
+
+    def __len__(self):
+        return self.n_blocks
+
+    def __getitem__(self, i):
+        import torch
+
+        if self._tokens is None:   # opened lazily so the dataset pickles into dataloader workers
+            self._tokens = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.n_tokens,))
+        start = i * self.block_size
+        ids = torch.from_numpy(self._tokens[start:start + self.block_size].astype(np.int64))
+        return {"input_ids": ids, "attention_mask": torch.ones_like(ids), "labels": ids.clone()}
@@ -0,0 +1,119 @@
+# backend/app/training_cache.py
+"""
+Warm base models for the training worker.
+
+A worker process keeps recently used base models in memory between jobs. A job
+checks a base out, wraps it with a fresh LoRA, and checks it back in; check-in
+strips the LoRA layers and training hooks so the next job starts from a
+pristine base. Bounded by WORKER_MAX_MODELS / WORKER_MODEL_CACHE_MB (LRU).
+"""
+import gc
+import threading
+
+from .config import settings
+from .model_loader import load_causal_lm, load_tokenizer, peak_rss_mb, LoadStats
+from .resident_cache import ResidentCache
+
+MB = 1024 * 1024
+
+_bases = ResidentCache(
+    "training_bases",
+    max_entries=settings.WORKER_MAX_MODELS,
+    max_bytes=settings.WORKER_MODEL_CACHE_MB * MB,
+    on_evict=lambda key, model: gc.collect(),
+)
+_tokenizers = ResidentCache("training_tokenizers", max_entries=16)
+_checked_out = {}   # key -> model currently lent to a job
+_lock = threading.Lock()
+
+
+def tokenizer_for(base_model: str):
+    return _tokenizers.get_or_load(base_model, lambda: load_tokenizer(base_model))
+
+
+def checkout_base(base_model: str, variant: str, **load_kwargs):
+    """Return (model, LoadStats) for a base, reusing a resident copy when possible.
+
+    `variant` names the load recipe (e.g. quantized vs full precision) and is part
+    of the cache key. A base already checked out by another job in this process
+    is loaded fresh instead of being shared.
+    """
+    key = (base_model, variant)
+    with _lock:
+        busy = key in _checked_out
+        if not busy:
+            _checked_out[key] = None
+
+    if busy or not settings.WORKER_KEEP_MODELS:
+        if not busy:
+            with _lock:
+                del _checked_out[key]
+        return load_causal_lm(base_model, **load_kwargs)
+
+    cold = []   # LoadStats of the load, if this call had to do it
+
+    def _load():
+        model, stats = load_causal_lm(base_model, **load_kwargs)
+        cold.append(stats)
+        return model
+
+    try:
+        model = _bases.get_or_load(key, _load, sizer=lambda m: m.get_memory_footprint())
+    except Exception:
+        with _lock:
+            del _checked_out[key]
+        raise
+    with _lock:
+        _checked_out[key] = model
+
+    # a warm hit costs this job no load time and no new memory
+    stats = cold[0] if cold else LoadStats(0.0, 0.0, peak_rss_mb())
+    print(f"[WARM] {base_model} ({variant}): {'cold load' if cold else 'warm hit'} {stats}")
+    return model, stats
+
+
+def restore_pristine(model):
+    """Undo everything a training run did to a base model; returns the bare base."""
+    from peft import PeftModel
+
+    if isinstance(model, PeftModel):
+        model = model.base_model.unload()   # drop LoRA layers without merging them
+    if hasattr(model, "peft_config"):
+        del model.peft_config
+    if getattr(model, "_require_grads_hook", None) is not None:
+        model.disable_input_require_grads()
+    if getattr(model, "is_gradient_checkpointing", False):
+        model.gradient_checkpointing_disable()
+    for param in model.parameters():
+        param.requires_grad_(False)
+    model.eval()
+
+    leftover = [name for name, _ in model.named_modules() if "lora_" in name]
+    if leftover:
+        raise RuntimeError(f"LoRA modules still attached after unload: {leftover[:3]}")
+    return model
+
+
+def checkin_base(base_model: str, variant: str, model):
+    """Return a checked-out base (possibly still PEFT-wrapped) to the cache.
+
+    Models that were loaded uncached (base busy, or caching disabled) are simply dropped.
+    """
+    from peft import PeftModel
+
+    key = (base_model, variant)
+    bare = model.get_base_model() if isinstance(model, PeftModel) else model
+    with _lock:
+        if _checked_out.get(key) is not bare:
+            return
+        del _checked_out[key]
+
+    try:
+        restore_pristine(model)
+    except Exception as e:
+        print(f"[WARM] Could not restore {base_model}, dropping it from cache -> {e}")
+        _bases.pop(key)
+
+
+def stats() -> dict:
+    return {**_bases.stats(), "checked_out": [str(k) for k in _checked_out]}
@@ -0,0 +1,33 @@
+import pytest
+
+from app.artifacts import parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=5-", (5, 99)),
+    ("bytes=90-500", (90, 99)),      # end clamped to the body
+    ("bytes=-10", (90, 99)),         # suffix
+    ("bytes=-500", (0, 99)),         # suffix longer than the body: all of it
+])
+def test_satisfiable(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None, "", "items=0-9", "bytes=0-1,5-6", "bytes=a-9", "bytes=0-b", "bytes=-x",
+])
+def test_ignored_sends_whole_body(header):
+    assert parse_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),   # starts past the end
+    ("bytes=9-5", 100),    # end before start
+    ("bytes=-0", 100),     # empty suffix
+    ("bytes=-5", 0),       # nothing to take a suffix of
+    ("bytes=0-", 0),
+])
+def test_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
@@ -0,0 +1,46 @@
+from app.bucketing import LengthGroupedBatchSampler, padding_efficiency, plan_batches
+
+
+def test_empty_input():
+    assert plan_batches([], token_budget=64, max_batch_size=8) == []
+    assert padding_efficiency([], []) == 1.0
+    sampler = LengthGroupedBatchSampler([], token_budget=64, max_batch_size=8)
+    assert len(sampler) == 0
+    assert list(sampler) == []
+
+
+def test_every_sample_once_and_under_budget():
+    lengths = [5, 17, 3, 40, 8, 8, 22, 1, 13, 30]
+    batches = plan_batches(lengths, token_budget=48, max_batch_size=4)
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+    for b in batches:
+        assert len(b) <= 4
+        assert max(lengths[i] for i in b) * len(b) <= 48
+
+
+def test_last_partial_batch():
+    batches = plan_batches([10] * 10, token_budget=1000, max_batch_size=4)
+    assert [len(b) for b in batches] == [4, 4, 2]
+
+
+def test_sample_longer_than_budget_gets_its_own_batch():
+    batches = plan_batches([4, 100, 4], token_budget=16, max_batch_size=8)
+    assert [1] in batches
+    assert sorted(i for b in batches for i in b) == [0, 1, 2]
+
+
+def test_similar_lengths_share_batches():
+    lengths = [1, 50, 2, 49, 3, 48]
+    batches = plan_batches(lengths, token_budget=150, max_batch_size=3)
+    assert sorted(sorted(lengths[i] for i in b) for b in batches) == [[1, 2, 3], [48, 49, 50]]
+    assert padding_efficiency(lengths, batches) == (6 + 147) / (3 * 3 + 3 * 50)
+
+
+def test_sampler_reshuffles_batches_each_epoch():
+    sampler = LengthGroupedBatchSampler(list(range(1, 41)), token_budget=40, max_batch_size=2, seed=3)
+    first, second = list(sampler), list(sampler)
+    assert sorted(first) == sorted(second) == sorted(sampler.batches)
+    assert first != second
+
+    sampler.set_epoch(0)
+    assert list(sampler) == first   # the order depends only on seed + epoch
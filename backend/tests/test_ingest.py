@@ -0,0 +1,62 @@
+from app.ingest import _ingest_shard, _splittable, corpus_hash, resolve_format, split_ranges
+
+
+def _write(tmp_path, data: bytes, name="data.txt"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _check_cover(path, ranges):
+    data = open(path, "rb").read()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start                      # contiguous, no gaps or overlap
+        assert data[start - 1:start] == b"\n"    # every cut is right after a newline
+
+
+def test_empty_file(tmp_path):
+    assert split_ranges(_write(tmp_path, b""), 16) == [(0, 0)]
+
+
+def test_file_smaller_than_target(tmp_path):
+    assert split_ranges(_write(tmp_path, b"one\ntwo\n"), 1024) == [(0, 8)]
+
+
+def test_ranges_cover_the_file_and_cut_at_newlines(tmp_path):
+    path = _write(tmp_path, b"".join(b"line %d of some text\n" % i for i in range(500)))
+    ranges = split_ranges(path, 256)
+    assert len(ranges) > 10
+    _check_cover(path, ranges)
+
+
+def test_blank_line_preferred_over_single_newline(tmp_path):
+    path = _write(tmp_path, b"a" * 10 + b"\n" + b"b" * 5 + b"\n\n" + b"c" * 30 + b"\n")
+    assert split_ranges(path, 8)[0] == (0, 18)   # after "\n\n", not the first "\n"
+
+
+def test_no_newline_is_one_range(tmp_path):
+    path = _write(tmp_path, b"x" * 5000)
+    assert split_ranges(path, 100) == [(0, 5000)]
+
+
+def test_shards_concatenate_to_the_whole_text(tmp_path):
+    text = "".join(f"doc {i}\r\nsecond line é\n\n" for i in range(300))
+    path = _write(tmp_path, text.encode("utf-8"))
+    shards = []
+    for i, (a, b) in enumerate(split_ranges(path, 200)):
+        out = str(tmp_path / f"shard_{i}.txt")
+        _ingest_shard(("txt", path, a, b, "utf-8", out))
+        shards.append(open(out, encoding="utf-8").read())
+    assert "".join(shards) == text.replace("\r\n", "\n")
+
+
+def test_only_ascii_compatible_encodings_split():
+    assert _splittable("utf-8") and _splittable("latin-1")
+    assert not _splittable("utf-16-le") and not _splittable("utf_32")
+
+
+def test_format_is_part_of_the_corpus_key(tmp_path):
+    assert resolve_format("x", "notes.jsonl") == "jsonl"
+    assert resolve_format(_write(tmp_path, b"plain", "fake.docx"), "fake.docx") == "txt"   # not a zip
+    assert corpus_hash("ab" * 32, "txt") != corpus_hash("ab" * 32, "jsonl")
@@ -0,0 +1,46 @@
+import pytest
+
+from app import job_spec
+from app.job_spec import CPU_FP32, QLORA_VARIANT, job_fingerprint
+
+HASH = "ab" * 32
+BASE = dict(content_hash=HASH, data_format="txt", base_model="gpt2", epochs=1, data_mode="packed",
+            profile=CPU_FP32)
+
+
+@pytest.fixture(autouse=True)
+def fixed_revision(monkeypatch):
+    # no model store / HF cache lookups
+    monkeypatch.setattr(job_spec, "base_revision", lambda base_model: "rev-1")
+
+
+@pytest.mark.parametrize("content_hash", [None, ""])
+def test_legacy_dataset_without_hash_is_never_fingerprinted(content_hash):
+    assert job_fingerprint(**{**BASE, "content_hash": content_hash}) is None
+
+
+def test_deterministic():
+    assert job_fingerprint(**BASE) == job_fingerprint(**BASE)
+    assert len(job_fingerprint(**BASE)) == 64
+
+
+def test_missing_data_mode_means_packed():
+    assert job_fingerprint(**{**BASE, "data_mode": None}) == job_fingerprint(**BASE)
+
+
+@pytest.mark.parametrize("change", [
+    {"content_hash": "cd" * 32},
+    {"data_format": "jsonl"},       # same bytes parsed differently
+    {"base_model": "distilgpt2"},
+    {"epochs": 2},
+    {"data_mode": "bucketed"},
+    {"profile": QLORA_VARIANT},
+])
+def test_every_input_changes_the_fingerprint(change):
+    assert job_fingerprint(**{**BASE, **change}) != job_fingerprint(**BASE)
+
+
+def test_base_revision_changes_the_fingerprint(monkeypatch):
+    before = job_fingerprint(**BASE)
+    monkeypatch.setattr(job_spec, "base_revision", lambda base_model: "rev-2")
+    assert job_fingerprint(**BASE) != before
@@ -0,0 +1,46 @@
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from app.listing import decode_cursor, encode_cursor, etag_matches, parse_fields
+
+
+def test_cursor_round_trip():
+    for last_id in (1, 42, 10 ** 12):
+        cursor = encode_cursor(last_id)
+        assert "=" not in cursor   # safe in a query string as-is
+        assert decode_cursor(cursor) == last_id
+
+
+def _raw(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!not-base64!!",
+    _raw("id:abc"),         # not an id
+    _raw("offset:5"),       # another prefix
+    _raw("5"),
+    "é",
+])
+def test_tampered_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_parse_fields():
+    assert parse_fields(None, ("id", "status"), {"id", "status"}) == ["id", "status"]
+    assert parse_fields("status,id", ("id",), {"id", "status"}) == ["id", "status"]
+    with pytest.raises(HTTPException) as e:
+        parse_fields("status,secret", ("id",), {"id", "status"})
+    assert e.value.status_code == 400
+
+
+def test_etag_matches():
+    assert not etag_matches(None, '"a"')
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
@@ -1,2 +1,6 @@
 #!/bin/bash
-celery -A app.tasks.celery_app worker --loglevel=info --concurrency=1
+# WORKER_QUEUES / WORKER_CONCURRENCY select the role:
+#   GPU worker: train_large, concurrency 1 | CPU worker: train_small, several jobs at once
+celery -A app.tasks.celery_app worker --loglevel=info \
+    -Q "${WORKER_QUEUES:-train_small,train_large}" \
+    --concurrency="${WORKER_CONCURRENCY:-1}"